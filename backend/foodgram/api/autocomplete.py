@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import connection
+
+from core.models import Ingredient
+from .catalog import get_catalog
+
+
+DEFAULT_AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+
+
+def get_backend():
+    if settings.INGREDIENT_AUTOCOMPLETE_BACKEND:
+        return settings.INGREDIENT_AUTOCOMPLETE_BACKEND
+    if connection.vendor == 'postgresql':
+        return 'database'
+    return 'memory'
+
+
+def search_database(query, limit=DEFAULT_AUTOCOMPLETE_LIMIT):
+    matches = list(Ingredient.objects.filter(
+        name__istartswith=query
+    ).order_by('name')[:limit])
+    if len(matches) < limit:
+        matches += Ingredient.objects.filter(name__icontains=query).exclude(
+            name__istartswith=query
+        ).order_by('name')[:limit - len(matches)]
+    return matches
+
+
+def autocomplete(query, limit=DEFAULT_AUTOCOMPLETE_LIMIT):
+    if not query:
+        return []
+    limit = max(1, min(limit, MAX_AUTOCOMPLETE_LIMIT))
+    if get_backend() == 'database':
+        return search_database(query, limit)
+    return get_catalog().ingredient_index.search(query, limit)
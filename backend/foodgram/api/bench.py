@@ -0,0 +1,466 @@
+from contextlib import contextmanager
+import random
+import statistics
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from core.management.commands.recount_popularity import COUNTERS, count_rows
+from core.models import (Cart, Favorite, Follow, Ingredient, Recipe,
+                         RecipeIngredientAmount, RecipeTag, Tag)
+from .cart_totals import derive_cart_totals
+from .catalog import reset_catalog
+from .loaders import READERS, load_ingredients
+from .pantry import get_pantry_index, invalidate_pantry
+from .search import refresh_search
+
+
+User = get_user_model()
+
+DATA_DIR = settings.BASE_DIR.parent.parent / 'data'
+INGREDIENTS_FILE = DATA_DIR / 'ingredients.json'
+MAX_KEYSTROKES = 12
+BATCH_SIZE = 1000
+BENCH_PREFIX = 'bench'
+BENCH_EMAIL_DOMAIN = 'example.com'
+PAGE_SIZE = 6
+PANTRY_SIZE = 20
+BENCH_IMAGE = 'recipes/images/benchmark.png'
+DISH_WORDS = (
+    'суп', 'борщ', 'салат', 'пирог', 'каша', 'котлеты', 'рагу', 'плов',
+    'запеканка', 'блины', 'омлет', 'паста', 'жаркое', 'гуляш', 'оладьи',
+    'домашний', 'быстрый', 'летний', 'острый', 'сливочный', 'овощной',
+    'грибной', 'куриный', 'рыбный', 'сырный', 'печёный', 'томлёный',
+)
+BENCH_TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+
+
+def summarize(samples, queries=()):
+    ordered = sorted(samples)
+    if len(ordered) > 1:
+        cuts = statistics.quantiles(ordered, n=100, method='inclusive')
+    else:
+        cuts = ordered * 99
+    summary = {
+        'samples': len(ordered),
+        'p50_ms': round(cuts[49] * 1000, 3),
+        'p90_ms': round(cuts[89] * 1000, 3),
+        'p99_ms': round(cuts[98] * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+    if queries:
+        summary['queries_max'] = max(queries)
+    return summary
+
+
+def timed_get(client, path, **extra):
+    with CaptureQueriesContext(connection) as context:
+        start = time.perf_counter()
+        response = client.get(path, **extra)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = time.perf_counter() - start
+    if response.status_code >= 400:
+        raise RuntimeError(f'{path}: HTTP {response.status_code}')
+    return elapsed, len(context.captured_queries)
+
+
+def measure(client, paths, repeat=1, **extra):
+    samples, queries = [], []
+    for _ in range(repeat):
+        for path in paths:
+            elapsed, query_count = timed_get(client, path, **extra)
+            samples.append(elapsed)
+            queries.append(query_count)
+    return summarize(samples, queries)
+
+
+@contextmanager
+def rolled_back():
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def auth_headers(user):
+    token, _ = Token.objects.get_or_create(user=user)
+    return {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+
+def ensure_ingredients(path=INGREDIENTS_FILE):
+    if Ingredient.objects.exists():
+        return
+    reader = READERS[str(path).rsplit('.', 1)[-1].lower()]
+    with open(path, encoding='utf-8', newline='') as file:
+        load_ingredients(reader(file))
+
+
+def add_dataset_arguments(parser):
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ingredients-file')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--authors', type=int, default=100)
+    parser.add_argument('--recipes-per-author', type=int, default=10)
+    parser.add_argument('--tags', type=int, default=len(BENCH_TAGS))
+    parser.add_argument('--tags-per-recipe', type=int, default=2)
+    parser.add_argument('--ingredients-per-recipe', type=int, default=6)
+    parser.add_argument('--favorites-per-user', type=int, default=20)
+    parser.add_argument('--cart-per-user', type=int, default=5)
+    parser.add_argument('--follows-per-user', type=int, default=10)
+
+
+def seed_users(count, prefix=BENCH_PREFIX):
+    stamp = int(time.time() * 1000)
+    User.objects.bulk_create(
+        (User(username=f'{prefix}{stamp}_{index}',
+              email=f'{prefix}{stamp}_{index}@{BENCH_EMAIL_DOMAIN}',
+              first_name='Bench',
+              last_name=str(index),
+              password='!')
+         for index in range(count)),
+        batch_size=BATCH_SIZE
+    )
+    return list(User.objects.filter(
+        username__startswith=f'{prefix}{stamp}_'
+    ).order_by('id'))
+
+
+def bench_users(prefix=BENCH_PREFIX):
+    return User.objects.filter(
+        username__regex=rf'^{prefix}[0-9]+_[0-9]+$',
+        email__endswith=f'@{BENCH_EMAIL_DOMAIN}',
+        password='!'
+    )
+
+
+def seed_recipes(authors, per_author, rng):
+    recipes = (
+        Recipe(author=author,
+               name=' '.join(rng.sample(DISH_WORDS, 2)).capitalize(),
+               text=' '.join(rng.choices(DISH_WORDS, k=30)),
+               image=BENCH_IMAGE,
+               cooking_time=rng.randint(1, 180))
+        for author in authors
+        for index in range(per_author)
+    )
+    Recipe.objects.bulk_create(recipes, batch_size=BATCH_SIZE)
+    return Recipe.objects.filter(author__in=authors)
+
+
+def ensure_tags(count=len(BENCH_TAGS)):
+    existing = Tag.objects.count()
+    if existing < count:
+        generated = (
+            (f'Тег {index}', f'#{index:06X}', f'tag-{index}')
+            for index in range(len(BENCH_TAGS), count)
+        )
+        Tag.objects.bulk_create(
+            Tag(name=name, color=color, slug=slug)
+            for name, color, slug in [*BENCH_TAGS, *generated][existing:count]
+        )
+        reset_catalog()
+    return list(Tag.objects.all())
+
+
+def seed_recipe_links(recipes, rng, tags_per_recipe=2,
+                      ingredients_per_recipe=6):
+    tags = ensure_tags()
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    recipe_tags, recipe_ingredients = [], []
+    for recipe in recipes:
+        for tag in rng.sample(tags, min(tags_per_recipe, len(tags))):
+            recipe_tags.append(RecipeTag(recipe=recipe, tag=tag))
+        for ingredient_id in rng.sample(
+            ingredient_ids, min(ingredients_per_recipe, len(ingredient_ids))
+        ):
+            recipe_ingredients.append(RecipeIngredientAmount(
+                recipe=recipe,
+                ingredients_id=ingredient_id,
+                amount=rng.randint(1, 10)
+            ))
+    RecipeTag.objects.bulk_create(recipe_tags, batch_size=BATCH_SIZE)
+    RecipeIngredientAmount.objects.bulk_create(recipe_ingredients,
+                                               batch_size=BATCH_SIZE)
+
+
+def seed_user_lists(users, recipes, rng, per_user):
+    for model, count in per_user.items():
+        model.objects.bulk_create(
+            (model(user=user, recipe=recipe)
+             for user in users
+             for recipe in rng.sample(recipes, min(count, len(recipes)))),
+            batch_size=BATCH_SIZE
+        )
+
+
+def seed_follows(users, authors, rng, per_user):
+    follows = []
+    for user in users:
+        candidates = [author for author in authors if author.id != user.id]
+        for author in rng.sample(candidates, min(per_user, len(candidates))):
+            follows.append(Follow(user=user, following=author))
+    Follow.objects.bulk_create(follows, batch_size=BATCH_SIZE)
+
+
+def refresh_counters(recipes):
+    recipes.update(**{field: count_rows(model)
+                      for field, model in COUNTERS.items()})
+
+
+def seed_dataset(options, rng):
+    ensure_ingredients(options.get('ingredients_file') or INGREDIENTS_FILE)
+    ensure_tags(options['tags'])
+    users = seed_users(max(options['users'], options['authors']))
+    authors = users[:options['authors']]
+    recipes = seed_recipes(authors, options['recipes_per_author'], rng)
+    recipe_list = list(recipes.only('id'))
+    seed_recipe_links(recipe_list, rng,
+                      tags_per_recipe=options['tags_per_recipe'],
+                      ingredients_per_recipe=options['ingredients_per_recipe'])
+    seed_user_lists(users, recipe_list, rng, {
+        Favorite: options['favorites_per_user'],
+        Cart: options['cart_per_user'],
+    })
+    seed_follows(users, authors, rng, options['follows_per_user'])
+    refresh_counters(recipes)
+    derive_cart_totals(user.id for user in users)
+    refresh_search(recipe.id for recipe in recipe_list)
+    reset_catalog()
+    return {
+        'users': len(users),
+        'recipes': len(recipe_list),
+        'tags': Tag.objects.count(),
+        'ingredients': Ingredient.objects.count(),
+        'recipe_tags': RecipeTag.objects.filter(recipe__in=recipes).count(),
+        'recipe_ingredients': RecipeIngredientAmount.objects.filter(
+            recipe__in=recipes
+        ).count(),
+        'favorites': Favorite.objects.filter(user__in=users).count(),
+        'cart': Cart.objects.filter(user__in=users).count(),
+        'follows': Follow.objects.filter(user__in=users).count(),
+    }
+
+
+def bench_autocomplete(options):
+    results = {}
+    with rolled_back():
+        ensure_ingredients(options.get('ingredients_file')
+                           or INGREDIENTS_FILE)
+        reset_catalog()
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        names = random.Random(options['seed']).sample(
+            names, min(options['samples'], len(names))
+        )
+        endpoints = (
+            ('autocomplete', '/api/ingredients/autocomplete/?name={}'),
+            ('filter', '/api/ingredients/?name={}'),
+        )
+        client = Client()
+        for label, template in endpoints:
+            results[label] = measure(client, [
+                template.format(quote(name[:length]))
+                for name in names
+                for length in range(1, min(len(name), MAX_KEYSTROKES) + 1)
+            ])
+    reset_catalog()
+    return results
+
+
+def bench_subscriptions(options):
+    rng = random.Random(options['seed'])
+    with rolled_back():
+        viewer, *authors = seed_users(options['authors'] + 1)
+        seed_recipes(authors, options['recipes_per_author'], rng)
+        Follow.objects.bulk_create(
+            Follow(user=viewer, following=author) for author in authors
+        )
+        client = Client()
+        headers = auth_headers(viewer)
+        results = {}
+        for page_size in (6, options['authors']):
+            path = (f'/api/users/subscriptions/?limit={page_size}'
+                    '&recipes_limit=3')
+            results[f'limit={page_size}'] = measure(
+                client, [path], repeat=options['samples'], **headers
+            )
+    return results
+
+
+def bench_tags(options):
+    rng = random.Random(options['seed'])
+    with rolled_back():
+        authors = seed_users(options['authors'])
+        recipes = list(seed_recipes(authors, options['recipes_per_author'],
+                                    rng).only('id'))
+        seed_recipe_links(recipes, rng, ingredients_per_recipe=0)
+        slugs = [tag.slug or tag.name for tag in ensure_tags()]
+        client = Client()
+        results = {}
+        for label, query in (
+            ('one', f'tags={slugs[0]}'),
+            ('any', f'tags={slugs[0]}&tags={slugs[1]}'),
+            ('all', f'tags={slugs[0]}&tags={slugs[1]}&tags_mode=all'),
+        ):
+            results[label] = measure(
+                client, [f'/api/recipes/?{query}&limit=6'],
+                repeat=options['samples']
+            )
+    reset_catalog()
+    return results
+
+
+def find_viewer():
+    viewer = bench_users().filter(
+        cart_user__isnull=False,
+        user__isnull=False
+    ).order_by('id').first()
+    if viewer is None:
+        raise RuntimeError('Нет тестовых данных, запустите seed_benchmark.')
+    return viewer
+
+
+def api_endpoints():
+    recipe = Recipe.objects.filter(
+        author__in=bench_users()
+    ).order_by('-id').first()
+    tag = RecipeTag.objects.filter(recipe=recipe).select_related(
+        'tag'
+    ).first()
+    last_page = max(1, -(-Recipe.objects.count() // PAGE_SIZE))
+    names = RecipeIngredientAmount.objects.filter(
+        recipe=recipe, ingredients__isnull=False
+    ).values_list('ingredients__name', flat=True)
+    listing = f'/api/recipes/?limit={PAGE_SIZE}'
+    endpoints = {
+        'recipes': ([listing], False),
+        'recipes_deep_page': ([f'{listing}&page={last_page}'], False),
+        'recipes_cursor': ([f'{listing}&pagination=cursor'], False),
+        'recipes_author': ([f'{listing}&author={recipe.author_id}'], False),
+        'recipes_authenticated': ([listing], True),
+        'recipes_favorited': ([f'{listing}&is_favorited=1'], True),
+        'recipes_in_cart': ([f'{listing}&is_in_shopping_cart=1'], True),
+        'subscriptions': ([f'/api/users/subscriptions/?limit={PAGE_SIZE}'
+                           '&recipes_limit=3'], True),
+        'ingredients_name': ([f'/api/ingredients/?name={quote(name[:3])}'
+                              for name in names], False),
+        'cart_totals': (['/api/recipes/shopping_cart/'], True),
+        'download_pdf': (['/api/recipes/download_shopping_cart/'], True),
+        'download_txt': (['/api/recipes/download_shopping_cart/'
+                          '?format=txt'], True),
+    }
+    if tag is not None:
+        slug = tag.tag.slug or tag.tag.name
+        endpoints['recipes_tags'] = (
+            [f'{listing}&tags={quote(slug)}'], False
+        )
+    return endpoints
+
+
+def bench_api(options):
+    rng = random.Random(options['seed'])
+    results = {}
+    with rolled_back():
+        if not options.get('existing'):
+            seed_dataset(options, rng)
+        viewer = find_viewer()
+        client = Client()
+        headers = auth_headers(viewer)
+        for label, (paths, authenticated) in sorted(
+            api_endpoints().items()
+        ):
+            extra = headers if authenticated else {}
+            results[label] = measure(client, paths,
+                                     repeat=options['samples'], **extra)
+    reset_catalog()
+    return results
+
+
+def bench_search(options):
+    rng = random.Random(options['seed'])
+    with rolled_back():
+        ensure_ingredients(options.get('ingredients_file')
+                           or INGREDIENTS_FILE)
+        authors = seed_users(options['authors'])
+        recipes = list(seed_recipes(authors, options['recipes_per_author'],
+                                    rng).only('id'))
+        seed_recipe_links(recipes, rng, tags_per_recipe=0,
+                          ingredients_per_recipe=options[
+                              'ingredients_per_recipe'
+                          ])
+        refresh_search()
+        names = list(RecipeIngredientAmount.objects.filter(
+            ingredients__isnull=False
+        ).values_list('ingredients__name', flat=True).distinct()[:100])
+        words = rng.sample(DISH_WORDS, min(options['samples'],
+                                           len(DISH_WORDS)))
+        ingredients = rng.sample(names, min(options['samples'], len(names)))
+        listing = f'/api/recipes/?limit={PAGE_SIZE}'
+        client = Client()
+        results = {
+            'search_word': measure(client, [
+                f'{listing}&search={quote(word)}' for word in words
+            ]),
+            'search_ingredient': measure(client, [
+                f'{listing}&search={quote(name)}' for name in ingredients
+            ]),
+            'ingredients_prefix': measure(client, [
+                f'{listing}&ingredients={quote(name[:3])}'
+                for name in ingredients
+            ]),
+        }
+    reset_catalog()
+    return results
+
+
+def bench_pantry(options):
+    rng = random.Random(options['seed'])
+    with rolled_back():
+        ensure_ingredients(options.get('ingredients_file')
+                           or INGREDIENTS_FILE)
+        authors = seed_users(options['authors'])
+        recipes = list(seed_recipes(authors, options['recipes_per_author'],
+                                    rng).only('id'))
+        seed_recipe_links(recipes, rng, tags_per_recipe=0,
+                          ingredients_per_recipe=options[
+                              'ingredients_per_recipe'
+                          ])
+        invalidate_pantry()
+        start = time.perf_counter()
+        get_pantry_index()
+        build = time.perf_counter() - start
+        ingredient_ids = list(RecipeIngredientAmount.objects.filter(
+            recipe__in=recipes
+        ).values_list('ingredients_id', flat=True).distinct())
+        paths = []
+        for _ in range(options['samples']):
+            pantry = rng.sample(ingredient_ids,
+                                min(PANTRY_SIZE, len(ingredient_ids)))
+            paths.append('/api/recipes/pantry/?' + '&'.join(
+                f'ingredients={ingredient_id}' for ingredient_id in pantry
+            ))
+        results = {
+            'index_build': summarize([build]),
+            'pantry': measure(Client(), paths),
+        }
+    invalidate_pantry()
+    return results
+
+
+SCENARIOS = {
+    'api': bench_api,
+    'autocomplete': bench_autocomplete,
+    'pantry': bench_pantry,
+    'search': bench_search,
+    'subscriptions': bench_subscriptions,
+    'tags': bench_tags,
+}
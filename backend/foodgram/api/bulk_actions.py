@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from core.models import Cart, Follow, Recipe
+from .cart_totals import (apply_amounts, lock_users, recipe_amounts,
+                          totals_applied_by_caller)
+from .shopping_list import invalidate_shopping_lists
+from .utils import change_counter
+
+
+User = get_user_model()
+
+MAX_BULK_ITEMS = 100
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+ABSENT = 'absent'
+NOT_FOUND = 'not_found'
+FORBIDDEN = 'forbidden'
+
+
+def link_results(add_ids, remove_ids, valid_ids, current_ids):
+    results = []
+    for pk in add_ids:
+        if pk not in valid_ids:
+            status = NOT_FOUND
+        elif pk in current_ids:
+            status = EXISTS
+        else:
+            status = ADDED
+        results.append({'id': pk, 'action': 'add', 'status': status})
+    for pk in remove_ids:
+        if pk not in valid_ids:
+            status = NOT_FOUND
+        elif pk in current_ids:
+            status = REMOVED
+        else:
+            status = ABSENT
+        results.append({'id': pk, 'action': 'remove', 'status': status})
+    return results
+
+
+def sync_links(user, model, field, valid_ids, add_ids, remove_ids):
+    lock_users([user.id])
+    current_ids = set(model.objects.filter(
+        user=user, **{f'{field}__in': [*add_ids, *remove_ids]}
+    ).values_list(field, flat=True))
+    created = [pk for pk in add_ids
+               if pk in valid_ids and pk not in current_ids]
+    deleted = [pk for pk in remove_ids if pk in current_ids]
+    if created:
+        model.objects.bulk_create(
+            (model(user=user, **{field: pk}) for pk in created),
+            ignore_conflicts=True
+        )
+    if deleted:
+        model.objects.filter(user=user,
+                             **{f'{field}__in': deleted}).delete()
+    return created, deleted, link_results(add_ids, remove_ids, valid_ids,
+                                          current_ids)
+
+
+def bulk_recipe_actions(user, model, add_ids, remove_ids):
+    valid_ids = set(Recipe.objects.filter(
+        id__in=[*add_ids, *remove_ids]
+    ).values_list('id', flat=True))
+    with transaction.atomic(), totals_applied_by_caller():
+        created, deleted, results = sync_links(
+            user, model, 'recipe_id', valid_ids, add_ids, remove_ids
+        )
+        change_counter(model, created, 1)
+        change_counter(model, deleted, -1)
+        if model is Cart:
+            apply_amounts(user.id, recipe_amounts(created), 1)
+            apply_amounts(user.id, recipe_amounts(deleted), -1)
+            if created:
+                invalidate_shopping_lists([user.id])
+    return results
+
+
+def bulk_follow(user, add_ids, remove_ids):
+    valid_ids = set(User.objects.filter(
+        id__in=[*add_ids, *remove_ids]
+    ).exclude(id=user.id).values_list('id', flat=True))
+    with transaction.atomic():
+        _, _, results = sync_links(
+            user, Follow, 'following_id', valid_ids, add_ids, remove_ids
+        )
+    for result in results:
+        if result['id'] == user.id:
+            result['status'] = FORBIDDEN
+    return results
@@ -0,0 +1,127 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth import get_user_model
+from django.db.models import (Case, F, PositiveIntegerField, Q, Sum,
+                              Value, When)
+
+from core.models import Cart, CartTotal, RecipeIngredientAmount
+
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+_applied_by_caller = ContextVar('cart_totals_applied_by_caller',
+                                default=False)
+
+
+@contextmanager
+def totals_applied_by_caller():
+    """Сигналы Cart не трогают итоги: вызывающий код пересчитает их сам."""
+    token = _applied_by_caller.set(True)
+    try:
+        yield
+    finally:
+        _applied_by_caller.reset(token)
+
+
+def signals_apply_totals():
+    return not _applied_by_caller.get()
+
+
+def recipe_amounts(recipe_ids):
+    amounts = Counter()
+    for ingredient_id, amount in RecipeIngredientAmount.objects.filter(
+        recipe_id__in=recipe_ids, ingredients__isnull=False
+    ).values_list('ingredients_id', 'amount'):
+        amounts[ingredient_id] += amount
+    return amounts
+
+
+def lock_users(user_ids):
+    list(User.objects.select_for_update().filter(
+        id__in=user_ids
+    ).order_by('id').values_list('id', flat=True))
+
+
+def apply_amounts(user_id, amounts, sign):
+    amounts = dict(amounts)
+    changed, stale_ids = [], []
+    for total in CartTotal.objects.filter(user_id=user_id,
+                                          ingredient_id__in=amounts):
+        total.amount += sign * amounts.pop(total.ingredient_id)
+        if total.amount > 0:
+            changed.append(total)
+        else:
+            stale_ids.append(total.id)
+    if changed:
+        CartTotal.objects.bulk_update(changed, ['amount'])
+    if stale_ids:
+        CartTotal.objects.filter(id__in=stale_ids).delete()
+    if sign > 0 and amounts:
+        CartTotal.objects.bulk_create(
+            CartTotal(user_id=user_id, ingredient_id=ingredient_id,
+                      amount=amount)
+            for ingredient_id, amount in amounts.items()
+        )
+
+
+def change_cart_totals(user_id, recipe_ids, sign):
+    amounts = recipe_amounts(recipe_ids)
+    if amounts:
+        lock_users([user_id])
+        apply_amounts(user_id, amounts, sign)
+
+
+def remove_recipe_from_totals(recipe_id, user_ids):
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    amounts = recipe_amounts([recipe_id])
+    if not amounts:
+        return
+    lock_users(user_ids)
+    totals = CartTotal.objects.filter(user_id__in=user_ids,
+                                      ingredient_id__in=amounts)
+    used_up = Q()
+    for ingredient_id, amount in amounts.items():
+        used_up |= Q(ingredient_id=ingredient_id, amount__lte=amount)
+    totals.filter(used_up).delete()
+    totals.update(amount=F('amount') - Case(
+        *(When(ingredient_id=ingredient_id, then=Value(amount))
+          for ingredient_id, amount in amounts.items()),
+        output_field=PositiveIntegerField()
+    ))
+
+
+def derive_cart_totals(user_ids=None):
+    carts = Cart.objects.filter(
+        recipe__isnull=False,
+        recipe__recipeingredientamount__ingredients__isnull=False
+    )
+    stale = CartTotal.objects.all()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        lock_users(user_ids)
+        carts = carts.filter(user_id__in=user_ids)
+        stale = stale.filter(user_id__in=user_ids)
+    stale.delete()
+    totals = carts.order_by().values_list(
+        'user_id', 'recipe__recipeingredientamount__ingredients_id'
+    ).annotate(total=Sum('recipe__recipeingredientamount__amount'))
+    CartTotal.objects.bulk_create(
+        (CartTotal(user_id=user_id, ingredient_id=ingredient_id,
+                   amount=total)
+         for user_id, ingredient_id, total in totals.iterator()),
+        batch_size=BATCH_SIZE
+    )
+
+
+def cart_rows(user):
+    return list(user.cart_totals.values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'amount'
+    ).order_by('ingredient__name'))
@@ -0,0 +1,137 @@
+from bisect import bisect_left
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from core.models import Ingredient, Tag
+
+
+VERSION_KEY = 'catalog:version'
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+class PrefixIndex:
+    """Отсортированный по имени список ингредиентов для поиска по префиксу."""
+
+    def __init__(self, ingredients):
+        self.entries = sorted(
+            ((ingredient.name.casefold(), ingredient.id), ingredient)
+            for ingredient in ingredients
+        )
+        self.keys = [entry[0][0] for entry in self.entries]
+
+    def iter_prefix(self, query):
+        position = bisect_left(self.keys, query)
+        while (position < len(self.keys)
+               and self.keys[position].startswith(query)):
+            yield self.entries[position][1]
+            position += 1
+
+    def prefix(self, query):
+        return list(self.iter_prefix(query.casefold()))
+
+    def search(self, query, limit):
+        query = query.casefold()
+        matches = []
+        for ingredient in self.iter_prefix(query):
+            matches.append(ingredient)
+            if len(matches) == limit:
+                return matches
+        for key, (_, ingredient) in zip(self.keys, self.entries):
+            if query in key and not key.startswith(query):
+                matches.append(ingredient)
+                if len(matches) == limit:
+                    break
+        return matches
+
+
+class CatalogSnapshot:
+    """Теги и ингредиенты, загруженные для одной версии справочников."""
+
+    def __init__(self, version, last_modified):
+        self.version = version
+        self.last_modified = last_modified
+        self.tags = Tag.objects.in_bulk()
+        self.ingredients = Ingredient.objects.in_bulk()
+        self._memo = {}
+        self._memo_lock = threading.Lock()
+
+    def memo(self, key, factory):
+        with self._memo_lock:
+            if key not in self._memo:
+                self._memo[key] = factory()
+            return self._memo[key]
+
+    @property
+    def ingredient_index(self):
+        return self.memo('ingredient_index',
+                         lambda: PrefixIndex(self.ingredients.values()))
+
+    @property
+    def tag_ids(self):
+        def build():
+            lookup = {tag.name: tag.id for tag in self.tags.values()}
+            lookup.update((tag.slug, tag.id) for tag in self.tags.values()
+                          if tag.slug)
+            return lookup
+        return self.memo('tag_ids', build)
+
+    def resolve_tags(self, values):
+        return {self.tag_ids[value] for value in values
+                if value in self.tag_ids}
+
+    @property
+    def etag(self):
+        return f'"catalog-{self.version}"'
+
+
+def new_version():
+    return uuid.uuid4().hex, int(time.time())
+
+
+def get_version():
+    stamp = cache.get(VERSION_KEY)
+    if stamp is None:
+        cache.add(VERSION_KEY, new_version(), None)
+        stamp = cache.get(VERSION_KEY)
+    return stamp
+
+
+def get_catalog():
+    global _snapshot
+    version, last_modified = get_version()
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = CatalogSnapshot(version, last_modified)
+        return _snapshot
+
+
+def reset_catalog():
+    global _snapshot
+    cache.set(VERSION_KEY, new_version(), None)
+    with _snapshot_lock:
+        _snapshot = None
+
+
+def invalidate_catalog():
+    transaction.on_commit(reset_catalog)
+
+
+def conditional_response(request, catalog):
+    return get_conditional_response(request,
+                                    etag=catalog.etag,
+                                    last_modified=catalog.last_modified)
+
+
+def set_validators(response, catalog):
+    response['ETag'] = catalog.etag
+    response['Last-Modified'] = http_date(catalog.last_modified)
+    response['Cache-Control'] = 'no-cache'
+    return response
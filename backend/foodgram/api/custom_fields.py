@@ -1,15 +1,73 @@
-import base64
+import binascii
 
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from django.core.files.base import ContentFile
+
+from .catalog import get_catalog
+from .images import (IMAGE_EXTENSIONS, ImageTooLarge, decode_base64,
+                     stored_image_name, variant_urls)
 
 
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            format, _, imgstr = data.partition(';base64,')
+            ext = IMAGE_EXTENSIONS.get(format.split('/')[-1].lower())
+            if ext is None or not imgstr:
+                self.fail('invalid_image')
+            try:
+                content, digest = decode_base64(
+                    imgstr, settings.MAX_IMAGE_UPLOAD_SIZE
+                )
+            except ImageTooLarge:
+                raise serializers.ValidationError(
+                    'Размер изображения превышает '
+                    f'{settings.MAX_IMAGE_UPLOAD_SIZE} байт.'
+                )
+            except (binascii.Error, ValueError):
+                self.fail('invalid_image')
+            image = super(Base64ImageField, self).to_internal_value(
+                File(content, name=f'{digest}.{ext}')
+            )
+            existing = stored_image_name(image.name)
+            if default_storage.exists(existing):
+                return existing
+            return image
 
         return super(Base64ImageField, self).to_internal_value(data)
+
+
+class ImageVariantsField(serializers.Field):
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        urls = variant_urls(recipe.image.name if recipe.image else None,
+                            recipe.image_variants)
+        request = self.context.get('request')
+        if urls is None or request is None:
+            return urls
+        return {variant: request.build_absolute_uri(url)
+                for variant, url in urls.items()}
+
+
+class CatalogTagField(serializers.PrimaryKeyRelatedField):
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        tag = get_catalog().tags.get(pk)
+        if tag is None:
+            tag = self.get_queryset().filter(pk=pk).first()
+        if tag is None:
+            self.fail('does_not_exist', pk_value=data)
+        return tag
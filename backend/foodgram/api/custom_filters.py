@@ -1,11 +1,16 @@
 from django_filters import rest_framework as filter
 from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
 
-from core.models import Recipe, Favorite, Cart, Ingredient
+from core.models import Recipe, RecipeTag, Favorite, Cart
+from .catalog import get_catalog
+from .search import search_recipes
 from .utils import filter_queryset
 
 User = get_user_model()
 
+TAGS_MODE_ALL = 'all'
+
 
 class RecipeFilter(filter.FilterSet):
     tags = filter.CharFilter(method='tags_filter')
@@ -13,10 +18,23 @@ class RecipeFilter(filter.FilterSet):
     is_in_shopping_cart = filter.CharFilter(method='cart_filter')
     ingredients = filter.CharFilter(field_name='ingredients__name',
                                     lookup_expr='istartswith')
+    search = filter.CharFilter(method='search_filter')
 
     def tags_filter(self, queryset, name, value):
-        tag_list = self.request.GET.getlist('tags')
-        return queryset.filter(tags__name__in=tag_list).distinct()
+        tag_ids = get_catalog().resolve_tags(self.request.GET.getlist('tags'))
+        if not tag_ids:
+            return queryset.none()
+        recipe_tags = RecipeTag.objects.filter(recipe=OuterRef('pk'))
+        if self.request.GET.get('tags_mode') == TAGS_MODE_ALL:
+            for tag_id in sorted(tag_ids):
+                queryset = queryset.filter(
+                    Exists(recipe_tags.filter(tag_id=tag_id))
+                )
+            return queryset
+        return queryset.filter(Exists(recipe_tags.filter(tag_id__in=tag_ids)))
+
+    def search_filter(self, queryset, name, value):
+        return search_recipes(queryset, value)
 
     def favorites_filter(self, queryset, name, value):
         return filter_queryset(self.request.user, Favorite, queryset)
@@ -27,12 +45,3 @@ class RecipeFilter(filter.FilterSet):
     class Meta:
         model = Recipe
         fields = ['tags', 'is_favorited', 'author', 'ingredients__name']
-
-
-class IngredientFilter(filter.FilterSet):
-    name = filter.CharFilter(field_name='name',
-                             lookup_expr='istartswith')
-
-    class Meta:
-        model = Ingredient
-        fields = ['name']
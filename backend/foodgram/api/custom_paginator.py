@@ -1,5 +1,183 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+import binascii
+import json
+
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+COUNT_EXACT = 'exact'
+COUNT_APPROX = 'approx'
+COUNT_NONE = 'none'
+
+
+def estimate_count(queryset):
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    if not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def get_count_mode(request, default):
+    mode = request.query_params.get('count', default)
+    if mode not in (COUNT_EXACT, COUNT_APPROX, COUNT_NONE):
+        return default
+    return mode
+
+
+class ApproximateCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if get_count_mode(request, COUNT_EXACT) == COUNT_APPROX:
+            self.django_paginator_class = ApproximateCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+
+class KeysetPagination(BasePagination):
+    """Постраничный вывод по курсору (created, id) без OFFSET."""
+
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор.'
+    ordering = ('-created', '-id')
+    invalid_ordering_message = ('Сортировка несовместима с постраничным '
+                                'выводом по курсору.')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if queryset.query.order_by and (
+            tuple(queryset.query.order_by) != self.ordering
+        ):
+            raise ValidationError(self.invalid_ordering_message)
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        count_mode = get_count_mode(request, COUNT_NONE)
+        self.count = None
+        if count_mode == COUNT_EXACT:
+            self.count = queryset.count()
+        elif count_mode == COUNT_APPROX:
+            self.count = estimate_count(queryset)
+
+        if reverse:
+            queryset = queryset.order_by('created', 'id')
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            created, pk = position
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created__gt=created) | Q(created=created, id__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created__lt=created) | Q(created=created, id__lt=pk)
+                )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode()))
+            created = parse_datetime(data['c'])
+            position = (created, int(data['i']))
+            reverse = bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if created is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, obj, reverse=False):
+        data = {'c': obj.created.isoformat(), 'i': obj.id}
+        if reverse:
+            data['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(data).encode()).decode()
+        return replace_query_param(self.base_url,
+                                   self.cursor_query_param,
+                                   encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+def select_pagination(request):
+    if (request.query_params.get('pagination') == 'cursor'
+            or KeysetPagination.cursor_query_param in request.query_params):
+        return KeysetPagination()
+    return CustomPageNumberPagination()
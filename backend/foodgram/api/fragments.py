@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from core.models import Recipe
+from .response_cache import bump_generation, get_generation
+from .serializers import RecipeSerializer
+from .utils import recipe_ingredients_prefetch
+from .viewer_state import ViewerState
+
+
+NAMESPACE = 'recipe_fragments'
+FRAGMENT_FIELDS = ('id', 'author_id', 'created', 'updated')
+
+
+def fragment_key(recipe, generation):
+    return (f'{NAMESPACE}:{generation}:{recipe.id}:'
+            f'{recipe.updated.timestamp()}')
+
+
+def build_fragments(recipe_ids, generation):
+    recipes = Recipe.objects.select_related('author').prefetch_related(
+        'tags', recipe_ingredients_prefetch()
+    ).filter(id__in=recipe_ids)
+    context = {'viewer_state': ViewerState()}
+    return {fragment_key(recipe, generation): dict(
+        RecipeSerializer(recipe, context=context).data
+    ) for recipe in recipes}
+
+
+def overlay(fragment, recipe, state, request):
+    data = dict(fragment)
+    data['author'] = dict(data['author'],
+                          is_subscribed=state.is_following(recipe.author_id))
+    data['is_favorited'] = state.is_favorited(recipe)
+    data['is_in_shopping_cart'] = state.is_in_shopping_cart(recipe)
+    if request is not None and data['image']:
+        data['image'] = request.build_absolute_uri(data['image'])
+        data['image_variants'] = {
+            variant: request.build_absolute_uri(url)
+            for variant, url in data['image_variants'].items()
+        }
+    return data
+
+
+def serialize_recipes(recipes, context):
+    recipes = list(recipes)
+    generation = get_generation(NAMESPACE)
+    keys = {recipe.id: fragment_key(recipe, generation)
+            for recipe in recipes}
+    fragments = cache.get_many(keys.values())
+    missing = [pk for pk, key in keys.items() if key not in fragments]
+    if missing:
+        fresh = build_fragments(missing, generation)
+        cache.set_many(fresh, settings.RECIPE_FRAGMENT_TIMEOUT)
+        fragments.update(fresh)
+        by_id = {fragment['id']: fragment for fragment in fresh.values()}
+        for pk in missing:
+            if pk in by_id:
+                fragments[keys[pk]] = by_id[pk]
+    state = ViewerState.from_context(context).load_recipes(recipes)
+    request = context.get('request')
+    return [overlay(fragments[keys[recipe.id]], recipe, state, request)
+            for recipe in recipes if keys[recipe.id] in fragments]
+
+
+def invalidate_fragments():
+    bump_generation(NAMESPACE)
+
+
+def delete_fragment(recipe):
+    cache.delete(fragment_key(recipe, get_generation(NAMESPACE)))
+
+
+class RecipeFragmentMixin:
+    """Список и карточка рецепта из кеша фрагментов."""
+
+    def get_queryset(self):
+        if self.action == 'list' or self.action == 'retrieve':
+            return Recipe.objects.only(*FRAGMENT_FIELDS)
+        return super().get_queryset()
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        return self.get_paginated_response(
+            serialize_recipes(page, self.get_serializer_context())
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        data = serialize_recipes([self.get_object()],
+                                 self.get_serializer_context())
+        if not data:
+            raise NotFound()
+        return Response(data[0])
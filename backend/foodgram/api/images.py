@@ -0,0 +1,132 @@
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+import base64
+import hashlib
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+from PIL import Image
+
+from core.models import Recipe
+from .response_cache import bump_generation
+from .workers import get_pool
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_UPLOAD_TO = Recipe._meta.get_field('image').upload_to
+VARIANTS_DIR = 'recipes/variants/'
+IMAGE_VARIANTS = {
+    'card': (480, 480),
+    'detail': (1200, 1200),
+}
+WEBP_QUALITY = 80
+DECODE_CHUNK = 64 * 1024
+SPOOL_SIZE = 1024 * 1024
+IMAGE_EXTENSIONS = {
+    'jpeg': 'jpg',
+    'jpg': 'jpg',
+    'png': 'png',
+    'gif': 'gif',
+    'webp': 'webp',
+}
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def decode_base64(encoded, max_size):
+    if len(encoded) // 4 * 3 > max_size + 2:
+        raise ImageTooLarge()
+    content = SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    digest = hashlib.sha256()
+    for start in range(0, len(encoded), DECODE_CHUNK):
+        chunk = base64.b64decode(encoded[start:start + DECODE_CHUNK],
+                                 validate=True)
+        digest.update(chunk)
+        content.write(chunk)
+    if content.tell() > max_size:
+        raise ImageTooLarge()
+    content.seek(0)
+    return content, digest.hexdigest()
+
+
+def stored_image_name(file_name):
+    return f'{IMAGE_UPLOAD_TO}{file_name}'
+
+
+def variant_name(image_name, variant):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{VARIANTS_DIR}{stem}_{variant}.webp'
+
+
+def variant_names(image_name):
+    return {variant: variant_name(image_name, variant)
+            for variant in IMAGE_VARIANTS}
+
+
+def variant_urls(image_name, stored):
+    if not image_name:
+        return None
+    urls = {}
+    for variant, name in variant_names(image_name).items():
+        if stored.get(variant) != name:
+            name = image_name
+        urls[variant] = default_storage.url(name)
+    return urls
+
+
+def generate_variants(image_name):
+    missing = {variant: size for variant, size in IMAGE_VARIANTS.items()
+               if not default_storage.exists(variant_name(image_name,
+                                                          variant))}
+    if not missing:
+        return []
+    with default_storage.open(image_name, 'rb') as file:
+        source = Image.open(file)
+        source.load()
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA')
+    generated = []
+    for variant, size in missing.items():
+        image = source.copy()
+        image.thumbnail(size)
+        buffer = BytesIO()
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY)
+        generated.append(default_storage.save(
+            variant_name(image_name, variant),
+            ContentFile(buffer.getvalue())
+        ))
+    return generated
+
+
+def refresh_variants(image_name):
+    generated = generate_variants(image_name)
+    variants = variant_names(image_name)
+    if Recipe.objects.filter(image=image_name).exclude(
+        image_variants=variants
+    ).update(image_variants=variants, updated=timezone.now()):
+        bump_generation('recipes')
+    return generated
+
+
+def refresh_variants_task(image_name):
+    try:
+        refresh_variants(image_name)
+    except Exception:
+        logger.exception('Не удалось создать варианты %s', image_name)
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(image_name):
+    if image_name and get_pool('images').try_submit(
+        refresh_variants_task, image_name
+    ) is None:
+        logger.warning('Пул изображений занят, варианты %s отложены',
+                       image_name)
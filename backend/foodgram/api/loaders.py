@@ -0,0 +1,138 @@
+from io import StringIO
+from itertools import islice
+import csv
+import json
+import time
+
+from django.db import connection, transaction
+
+from core.models import Ingredient
+from .catalog import invalidate_catalog
+
+
+BATCH_SIZE = 5000
+READ_SIZE = 64 * 1024
+NAME_LENGTH = Ingredient._meta.get_field('name').max_length
+UNIT_LENGTH = Ingredient._meta.get_field('measurement_unit').max_length
+INGREDIENT_TABLE = Ingredient._meta.db_table
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+        else:
+            yield '', ''
+
+
+def iter_json(file):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        chunk = file.read(READ_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise ValueError('Ожидается JSON-массив ингредиентов.')
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if not chunk:
+                    raise
+                break
+            yield item.get('name', ''), item.get('measurement_unit', '')
+        if not chunk:
+            return
+
+
+READERS = {
+    'csv': iter_csv,
+    'json': iter_json,
+}
+
+
+def clean_rows(rows, stats):
+    for name, measurement_unit in rows:
+        name = (name or '').strip()
+        measurement_unit = (measurement_unit or '').strip()
+        if (not name or not measurement_unit
+                or len(name) > NAME_LENGTH
+                or len(measurement_unit) > UNIT_LENGTH):
+            stats['skipped'] += 1
+            continue
+        stats['read'] += 1
+        yield name, measurement_unit
+
+
+def iter_batches(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def can_copy():
+    return connection.vendor == 'postgresql'
+
+
+def copy_batch(batch):
+    buffer = StringIO()
+    csv.writer(buffer).writerows(batch)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE IF NOT EXISTS ingredient_load '
+            '(name varchar(%s), measurement_unit varchar(%s))',
+            [NAME_LENGTH, UNIT_LENGTH]
+        )
+        cursor.copy_expert(
+            'COPY ingredient_load (name, measurement_unit) '
+            'FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+        cursor.execute(
+            f'INSERT INTO {INGREDIENT_TABLE} (name, measurement_unit) '
+            'SELECT DISTINCT name, measurement_unit FROM ingredient_load '
+            'ON CONFLICT (name, measurement_unit) DO NOTHING'
+        )
+        cursor.execute('TRUNCATE ingredient_load')
+
+
+def insert_batch(batch):
+    Ingredient.objects.bulk_create(
+        (Ingredient(name=name, measurement_unit=measurement_unit)
+         for name, measurement_unit in batch),
+        batch_size=len(batch),
+        ignore_conflicts=True
+    )
+
+
+def load_ingredients(rows, batch_size=BATCH_SIZE, use_copy=True,
+                     progress=None):
+    stats = {'read': 0, 'skipped': 0, 'created': 0, 'seconds': 0.0}
+    write_batch = copy_batch if use_copy and can_copy() else insert_batch
+    before = Ingredient.objects.count()
+    start = time.perf_counter()
+    for batch in iter_batches(clean_rows(rows, stats), batch_size):
+        with transaction.atomic():
+            write_batch(batch)
+        if progress is not None:
+            progress(stats['read'], time.perf_counter() - start)
+    stats['created'] = Ingredient.objects.count() - before
+    stats['seconds'] = time.perf_counter() - start
+    if stats['created']:
+        invalidate_catalog()
+    return stats
@@ -0,0 +1,46 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from api.bench import SCENARIOS, add_dataset_arguments
+
+
+class Command(BaseCommand):
+    help = 'Замеряет задержки эндпоинтов API на тестовых данных.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(SCENARIOS))
+        parser.add_argument('--samples', type=int, default=50)
+        parser.add_argument('--existing', action='store_true',
+                            help='Использовать данные seed_benchmark '
+                                 'вместо временных (сценарий api).')
+        parser.add_argument('--output',
+                            help='Файл для сохранения результатов в JSON.')
+        add_dataset_arguments(parser)
+
+    def handle(self, *args, **options):
+        logging.getLogger('api.queries').setLevel(logging.WARNING)
+        started = timezone.now()
+        try:
+            results = SCENARIOS[options['scenario']](options)
+        except RuntimeError as error:
+            raise CommandError(error)
+        for label, stats in results.items():
+            line = ' '.join(f'{key}={value}' for key, value in stats.items())
+            self.stdout.write(f'{label}: {line}')
+        if options['output']:
+            dataset = {key: options[key] for key in (
+                'seed', 'users', 'authors', 'recipes_per_author', 'tags',
+                'tags_per_recipe', 'ingredients_per_recipe',
+                'favorites_per_user', 'cart_per_user', 'follows_per_user',
+                'existing', 'samples',
+            )}
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({'scenario': options['scenario'],
+                           'started': started.isoformat(),
+                           'database': connection.vendor,
+                           'options': dataset,
+                           'results': results}, file, indent=2)
@@ -0,0 +1,90 @@
+from itertools import combinations
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+
+from api.bench import (ensure_ingredients, rolled_back, seed_recipe_links,
+                       seed_recipes, seed_user_lists, seed_users)
+from api.custom_filters import RecipeFilter
+from api.views import RecipeViewSet
+from core.models import Cart, Favorite, RecipeIngredientAmount, RecipeTag
+
+FILTERS = ('tags', 'author', 'ingredients', 'is_favorited',
+           'is_in_shopping_cart')
+
+
+class Command(BaseCommand):
+    help = ('Печатает план выполнения запроса списка рецептов '
+            'для каждой комбинации фильтров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-data', action='store_true',
+                            help='Заполнить базу тестовыми данными '
+                                 'и откатить их после вывода.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--authors', type=int, default=100)
+        parser.add_argument('--recipes-per-author', type=int, default=10)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--max-filters', type=int,
+                            default=len(FILTERS))
+
+    def handle(self, *args, **options):
+        if not options['seed_data']:
+            self.explain_all(self.sample_params(), options)
+            return
+        rng = random.Random(options['seed'])
+        with rolled_back():
+            ensure_ingredients()
+            viewer, *authors = seed_users(options['authors'] + 1)
+            recipes = list(seed_recipes(authors,
+                                        options['recipes_per_author'], rng))
+            seed_recipe_links(recipes, rng)
+            share = len(recipes) // 10
+            seed_user_lists([viewer], recipes, rng,
+                            {Favorite: share, Cart: share})
+            self.explain_all(self.sample_params(viewer), options)
+
+    def sample_params(self, viewer=None):
+        if viewer is None:
+            favorite = Favorite.objects.select_related('user').first()
+            viewer = favorite.user if favorite else None
+        recipe_tag = RecipeTag.objects.select_related(
+            'tag', 'recipe'
+        ).order_by('-id').first()
+        recipe_ingredient = RecipeIngredientAmount.objects.filter(
+            ingredients__isnull=False
+        ).select_related('ingredients').order_by('-id').first()
+        params = {}
+        if viewer is not None:
+            params.update(is_favorited='1', is_in_shopping_cart='1')
+        if recipe_tag is not None:
+            params['tags'] = recipe_tag.tag.name
+            params['author'] = str(recipe_tag.recipe.author_id)
+        if recipe_ingredient is not None:
+            params['ingredients'] = recipe_ingredient.ingredients.name[:3]
+        return viewer, params
+
+    def explain_all(self, sample, options):
+        viewer, params = sample
+        explain_options = {}
+        if connection.vendor == 'postgresql':
+            explain_options = {'analyze': True, 'buffers': True}
+        factory = RequestFactory()
+        available = [name for name in FILTERS if name in params]
+        for size in range(options['max_filters'] + 1):
+            for names in combinations(available, size):
+                query = {name: params[name] for name in names}
+                request = factory.get('/api/recipes/', query)
+                request.user = viewer
+                queryset = RecipeFilter(
+                    request.GET,
+                    queryset=RecipeViewSet.queryset.all(),
+                    request=request
+                ).qs[:options['limit']]
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    '== ' + (' + '.join(names) or 'без фильтров')
+                ))
+                self.stdout.write(queryset.explain(**explain_options))
+                self.stdout.write('')
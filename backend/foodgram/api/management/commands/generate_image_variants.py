@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api.images import refresh_variants
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие WebP-варианты изображений рецептов.'
+
+    def handle(self, *args, **options):
+        names = list(Recipe.objects.exclude(image='').order_by(
+            'image'
+        ).values_list('image', flat=True).distinct())
+        generated = 0
+        for name in names:
+            try:
+                generated += len(refresh_variants(name))
+            except OSError as error:
+                self.stderr.write(f'{name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено изображений: {len(names)}, '
+            f'создано вариантов: {generated}'
+        ))
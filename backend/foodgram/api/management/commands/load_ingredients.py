@@ -0,0 +1,47 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.loaders import BATCH_SIZE, READERS, load_ingredients
+
+
+class Command(BaseCommand):
+    help = 'Загружает справочник ингредиентов из CSV или JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(READERS),
+                            help='По умолчанию определяется по расширению.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Не использовать COPY в PostgreSQL.')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path.name}')
+        if options['batch_size'] <= 0:
+            raise CommandError('Размер пакета должен быть положительным.')
+        try:
+            with open(path, encoding='utf-8', newline='') as file:
+                stats = load_ingredients(
+                    READERS[file_format](file),
+                    batch_size=options['batch_size'],
+                    use_copy=not options['no_copy'],
+                    progress=self.report_progress
+                )
+        except OSError as error:
+            raise CommandError(error)
+        except ValueError as error:
+            raise CommandError(f'Некорректный файл {path.name}: {error}')
+        rate = stats['read'] / stats['seconds'] if stats['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Прочитано: {stats['read']}, добавлено: {stats['created']}, "
+            f"пропущено: {stats['skipped']}, "
+            f"{stats['seconds']:.2f} с ({rate:.0f} строк/с)"
+        ))
+
+    def report_progress(self, read, seconds):
+        rate = read / seconds if seconds else 0
+        self.stdout.write(f'Обработано строк: {read} ({rate:.0f} строк/с)')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.cart_totals import derive_cart_totals
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает итоги списков покупок по корзинам.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            derive_cart_totals()
+        self.stdout.write(self.style.SUCCESS('Итоги корзин пересчитаны.'))
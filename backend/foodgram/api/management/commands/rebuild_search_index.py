@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.search import refresh_search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс рецептов.'
+
+    def handle(self, *args, **options):
+        refresh_search()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс обновлён.'))
@@ -0,0 +1,26 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.bench import add_dataset_arguments, bench_users, seed_dataset
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу данными для нагрузочного тестирования.'
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument('--clear', action='store_true',
+                            help='Удалить ранее созданных тестовых '
+                                 'пользователей и их данные.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['clear']:
+                deleted, _ = bench_users().delete()
+                self.stdout.write(f'Удалено объектов: {deleted}')
+            summary = seed_dataset(options, random.Random(options['seed']))
+        for label, total in summary.items():
+            self.stdout.write(f'{label}: {total}')
+        self.stdout.write(self.style.SUCCESS('Данные созданы.'))
@@ -0,0 +1,108 @@
+from contextlib import ExitStack
+import heapq
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('api.queries')
+
+SLOWEST_QUERIES = 3
+SQL_PREVIEW_LENGTH = 300
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryRecorder:
+    """Считает запросы к базе, их суммарное время и самые медленные."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            entry = (elapsed, self.count, sql)
+            if len(self.slowest) < SLOWEST_QUERIES:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+    def slowest_queries(self):
+        return [{'ms': round(elapsed * 1000, 3),
+                 'sql': sql[:SQL_PREVIEW_LENGTH]}
+                for elapsed, _, sql in sorted(self.slowest, reverse=True)]
+
+
+def get_view_budget(view_func, method):
+    view_class = getattr(view_func, 'cls', None)
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower())
+    budgets = getattr(view_class, 'query_budgets', None) or {}
+    view_name = view_class.__name__ if view_class else view_func.__name__
+    return f'{view_name}.{action}' if action else view_name, budgets.get(
+        action
+    )
+
+
+class QueryInstrumentationMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.query_view = None
+        request.query_budget = None
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = (
+                f'db;dur={recorder.duration * 1000:.2f};'
+                f'desc="{recorder.count} queries", '
+                f'total;dur={total * 1000:.2f}'
+            )
+
+        budget = request.query_budget
+        over_budget = budget is not None and recorder.count > budget
+        stats = {
+            'method': request.method,
+            'path': request.path,
+            'view': request.query_view,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'budget': budget,
+            'sql_ms': round(recorder.duration * 1000, 3),
+            'total_ms': round(total * 1000, 3),
+            'slowest': recorder.slowest_queries(),
+        }
+        logger.log(logging.WARNING if over_budget else logging.INFO,
+                   json.dumps(stats, ensure_ascii=False))
+        if over_budget and settings.QUERY_BUDGETS_STRICT:
+            raise QueryBudgetExceeded(
+                f'{request.query_view}: {recorder.count} запросов '
+                f'при бюджете {budget}'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_view, request.query_budget = get_view_budget(
+            view_func, request.method
+        )
@@ -0,0 +1,137 @@
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+import heapq
+import threading
+
+from django.core.cache import cache
+
+from core.models import Recipe, RecipeIngredientAmount
+from .response_cache import bump_generation, get_generation
+
+
+NAMESPACE = 'pantry'
+DEFAULT_PANTRY_LIMIT = 20
+MAX_PANTRY_LIMIT = 100
+MAX_PANTRY_INGREDIENTS = 200
+CHANGES_TIMEOUT = 24 * 60 * 60
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def sequence_key(generation):
+    return f'{NAMESPACE}:{generation}:sequence'
+
+
+def changes_key(generation, sequence):
+    return f'{NAMESPACE}:{generation}:changes:{sequence}'
+
+
+def recipe_ingredient_pairs(recipe_ids=None):
+    rows = RecipeIngredientAmount.objects.filter(recipe__isnull=False,
+                                                 ingredients__isnull=False)
+    if recipe_ids is not None:
+        rows = rows.filter(recipe_id__in=recipe_ids)
+    return rows.order_by('recipe_id', 'ingredients_id').values_list(
+        'recipe_id', 'ingredients_id'
+    ).distinct()
+
+
+class PantryIndex:
+    """Обратный индекс: ингредиент -> отсортированные id рецептов."""
+
+    def __init__(self, generation, sequence):
+        self.generation = generation
+        self.sequence = sequence
+        self.postings = {}
+        self.recipes = {}
+        for recipe_id, ingredient_id in recipe_ingredient_pairs():
+            self.postings.setdefault(ingredient_id,
+                                     array('q')).append(recipe_id)
+            self.recipes.setdefault(recipe_id, []).append(ingredient_id)
+
+    def remove(self, recipe_id):
+        for ingredient_id in self.recipes.pop(recipe_id, ()):
+            posting = self.postings[ingredient_id]
+            del posting[bisect_left(posting, recipe_id)]
+
+    def update(self, recipe_ids, sequence):
+        for recipe_id in recipe_ids:
+            self.remove(recipe_id)
+        for recipe_id, ingredient_id in recipe_ingredient_pairs(recipe_ids):
+            insort(self.postings.setdefault(ingredient_id, array('q')),
+                   recipe_id)
+            self.recipes.setdefault(recipe_id, []).append(ingredient_id)
+        self.sequence = sequence
+
+    def match(self, ingredient_ids, limit=DEFAULT_PANTRY_LIMIT):
+        owned = Counter()
+        for ingredient_id in set(ingredient_ids):
+            owned.update(self.postings.get(ingredient_id, ()))
+        best = heapq.nlargest(limit, owned.items(), key=lambda item: (
+            item[1] / len(self.recipes[item[0]]), item[1], item[0]
+        ))
+        return [(recipe_id, matched, len(self.recipes[recipe_id]))
+                for recipe_id, matched in best]
+
+
+def pending_changes(generation, start, stop):
+    keys = [changes_key(generation, sequence)
+            for sequence in range(start + 1, stop + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return None
+    return {recipe_id for key in keys for recipe_id in changes[key]}
+
+
+def get_pantry_index():
+    global _index
+    generation = get_generation(NAMESPACE)
+    sequence = cache.get(sequence_key(generation), 0)
+    with _index_lock:
+        if _index is not None and _index.generation == generation:
+            if _index.sequence == sequence:
+                return _index
+            changed = pending_changes(generation, _index.sequence, sequence)
+            if changed is not None:
+                _index.update(changed, sequence)
+                return _index
+        _index = PantryIndex(generation, sequence)
+        return _index
+
+
+def match_pantry(ingredient_ids, limit=DEFAULT_PANTRY_LIMIT):
+    index = get_pantry_index()
+    with _index_lock:
+        return index.match(ingredient_ids, limit)
+
+
+def pantry_recipes(ingredient_ids, limit=DEFAULT_PANTRY_LIMIT):
+    matches = match_pantry(ingredient_ids, limit)
+    recipes = Recipe.objects.only(
+        'id', 'name', 'image', 'image_variants', 'cooking_time'
+    ).in_bulk([recipe_id for recipe_id, _, _ in matches])
+    result = []
+    for recipe_id, matched, total in matches:
+        recipe = recipes.get(recipe_id)
+        if recipe is not None:
+            recipe.matched, recipe.total = matched, total
+            result.append(recipe)
+    return result
+
+
+def record_pantry_changes(recipe_ids):
+    generation = get_generation(NAMESPACE)
+    key = sequence_key(generation)
+    cache.add(key, 0, None)
+    sequence = cache.incr(key)
+    cache.set(changes_key(generation, sequence), list(recipe_ids),
+              CHANGES_TIMEOUT)
+
+
+def invalidate_pantry():
+    global _index
+    bump_generation(NAMESPACE)
+    with _index_lock:
+        _index = None
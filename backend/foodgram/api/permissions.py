@@ -9,7 +9,7 @@ class RecipeAuthorOrReadOnly:
 
     def has_object_permission(self, request, view, obj):
         return (
-            obj.author == request.user
+            obj.author_id == request.user.id
             or request.method in permissions.SAFE_METHODS
             or (request.user.is_authenticated
                 and 'favorite' in request.resolver_match.route)
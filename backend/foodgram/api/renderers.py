@@ -0,0 +1,35 @@
+from rest_framework import renderers
+
+
+class ShoppingListRenderer(renderers.BaseRenderer):
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'text/plain; charset=utf-8'
+        if isinstance(data, dict) and 'detail' in data:
+            data = data['detail']
+        return str(data).encode('utf-8')
+
+
+class PDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+
+class TXTRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+SHOPPING_LIST_RENDERERS = (PDFRenderer,
+                           TXTRenderer,
+                           CSVRenderer,
+                           renderers.JSONRenderer)
@@ -0,0 +1,80 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import urlencode
+from rest_framework.response import Response
+
+
+CACHE_PREFIX = 'response'
+
+
+def generation_key(namespace):
+    return f'{CACHE_PREFIX}:{namespace}:generation'
+
+
+def get_generation(namespace):
+    key = generation_key(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(namespace):
+    transaction.on_commit(
+        lambda: cache.set(generation_key(namespace), uuid.uuid4().hex, None)
+    )
+
+
+def normalized_query(request):
+    return urlencode(sorted(
+        (key, sorted(values))
+        for key, values in request.query_params.lists()
+    ), doseq=True)
+
+
+def response_cache_key(namespace, request, action, lookup):
+    digest = hashlib.sha1(
+        f'{request.get_host()}?{normalized_query(request)}'.encode()
+    ).hexdigest()
+    return (f'{CACHE_PREFIX}:{namespace}:{get_generation(namespace)}:'
+            f'{action}:{lookup or ""}:{digest}')
+
+
+class AnonymousResponseCacheMixin:
+    """Общий кеш ответов list/retrieve для анонимных пользователей."""
+
+    response_cache_namespace = None
+
+    def cached_response(self, request, action, build):
+        if not request.user.is_anonymous:
+            return build()
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        key = response_cache_key(self.response_cache_namespace,
+                                 request, action, lookup)
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        response = build()
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        build = super().list
+        return self.cached_response(
+            request, 'list', lambda: build(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        build = super().retrieve
+        return self.cached_response(
+            request, 'retrieve', lambda: build(request, *args, **kwargs)
+        )
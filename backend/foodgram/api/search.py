@@ -0,0 +1,98 @@
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from core.models import Recipe, RecipeIngredientAmount
+
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipe_search'
+
+
+def ingredient_names():
+    return Subquery(RecipeIngredientAmount.objects.filter(
+        recipe=OuterRef('pk'), ingredients__isnull=False
+    ).order_by().values('recipe').annotate(
+        names=StringAgg('ingredients__name', ' ')
+    ).values('names'))
+
+
+def search_vector():
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Coalesce(ingredient_names(), Value('')),
+                       weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def refresh_search(recipe_ids=None):
+    if connection.vendor == 'postgresql':
+        recipes = Recipe.objects.all()
+        if recipe_ids is not None:
+            recipes = recipes.filter(id__in=recipe_ids)
+        recipes.update(search_vector=search_vector())
+    elif connection.vendor == 'sqlite':
+        delete_where = insert_where = ''
+        params = []
+        if recipe_ids is not None:
+            params = list(recipe_ids)
+            if not params:
+                return
+            placeholders = ', '.join(['%s'] * len(params))
+            delete_where = f'WHERE rowid IN ({placeholders})'
+            insert_where = f'WHERE r.id IN ({placeholders})'
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} {delete_where}', params)
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text, ingredients) '
+                'SELECT r.id, r.name, r.text, COALESCE(('
+                "SELECT group_concat(i.name, ' ') "
+                'FROM core_recipeingredientamount a '
+                'JOIN core_ingredient i ON i.id = a.ingredients_id '
+                "WHERE a.recipe_id = r.id), '') "
+                f'FROM core_recipe r {insert_where}',
+                params
+            )
+
+
+def drop_from_search(recipe_id):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [recipe_id])
+
+
+def fts_query(value):
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', value))
+
+
+def search_recipes(queryset, value):
+    value = value.strip()
+    if not value:
+        return queryset
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(value, config=SEARCH_CONFIG,
+                            search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-created', '-id')
+    if connection.vendor == 'sqlite':
+        match = fts_query(value)
+        if not match:
+            return queryset.none()
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE} MATCH %s',
+                   f'{FTS_TABLE}.rowid = core_recipe.id'],
+            params=[match],
+            select={'search_rank': f'{FTS_TABLE}.rank'},
+        ).order_by('search_rank', '-created', '-id')
+    return queryset.filter(
+        Q(name__icontains=value) | Q(text__icontains=value)
+    )
@@ -1,18 +1,28 @@
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import models, transaction
+from django.db.models import prefetch_related_objects
 from djoser.serializers import UserCreateSerializer
 from rest_framework import serializers
 
-from core.models import (Recipe, Tag, Ingredient, Follow, Favorite, Cart)
-from .custom_fields import Base64ImageField
-from .utils import object_exist_in_essence, ingredient_create, tag_create
+from core.models import (Recipe, Tag, Ingredient, Follow,
+                         RecipeIngredientAmount, CartTotal)
+from .autocomplete import (DEFAULT_AUTOCOMPLETE_LIMIT,
+                           MAX_AUTOCOMPLETE_LIMIT)
+from .bulk_actions import MAX_BULK_ITEMS
+from .custom_fields import (Base64ImageField, CatalogTagField,
+                            ImageVariantsField)
+from .pantry import (DEFAULT_PANTRY_LIMIT, MAX_PANTRY_INGREDIENTS,
+                     MAX_PANTRY_LIMIT)
+from .utils import (ingredient_create, ingredient_update, tag_create,
+                    tag_update, recipe_ingredients_prefetch,
+                    get_recipes_limit, latest_recipes_by_author)
+from .viewer_state import ViewerState
 
 
 User = get_user_model()
 
 MAX_AMOUNT = 32000
 MIN_AMOUNT = 1
-RECIPE_SLICE = 3
 
 
 class ChangePasswordSerializer(serializers.Serializer):
@@ -52,6 +62,16 @@ class CustomPostUserSerializer(UserCreateSerializer):
         }
 
 
+class ViewerStateListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        data = list(data)
+        self.child.preload_viewer_state(data)
+        return super().to_representation(data)
+
+
 class CustomUserSerializer(UserCreateSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
@@ -73,13 +93,15 @@ class CustomUserSerializer(UserCreateSerializer):
             'last_name': {'required': True},
             'password': {'required': True},
         }
+        list_serializer_class = ViewerStateListSerializer
+
+    def preload_viewer_state(self, users):
+        ViewerState.from_context(self.context).load_authors(
+            user.id for user in users
+        )
 
     def get_is_subscribed(self, obj):
-        return object_exist_in_essence(self.context.get('request'),
-                                       Follow,
-                                       obj,
-                                       'following',
-                                       'user')
+        return ViewerState.from_context(self.context).is_subscribed(obj)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -89,21 +111,29 @@ class TagSerializer(serializers.ModelSerializer):
 
 
 class IngredientListSerializer(serializers.ModelSerializer):
-    amount = serializers.SerializerMethodField()
+    id = serializers.IntegerField(source='ingredients.id', read_only=True)
+    name = serializers.CharField(source='ingredients.name', read_only=True)
+    measurement_unit = serializers.CharField(
+        source='ingredients.measurement_unit',
+        read_only=True
+    )
 
     class Meta:
-        model = Ingredient
+        model = RecipeIngredientAmount
         fields = ('id', 'amount', 'name', 'measurement_unit')
 
-    def get_amount(self, obj):
-        recipe_id = self.context.get('recipe_id')
-        recipe = Recipe.objects.filter(id=recipe_id).first()
-        amount = obj.amount.filter(
-            recipeingredientamount__recipe=recipe
-        ).first()
-        if amount:
-            return amount.amount
-        return None
+
+class CartTotalSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='ingredient.id', read_only=True)
+    name = serializers.CharField(source='ingredient.name', read_only=True)
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit',
+        read_only=True
+    )
+
+    class Meta:
+        model = CartTotal
+        fields = ('id', 'amount', 'name', 'measurement_unit')
 
 
 class IngredientPostSerializer(serializers.ModelSerializer):
@@ -122,12 +152,59 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
+class AutocompleteQuerySerializer(serializers.Serializer):
+    name = serializers.CharField(source='query', max_length=200)
+    limit = serializers.IntegerField(min_value=1,
+                                     max_value=MAX_AUTOCOMPLETE_LIMIT,
+                                     default=DEFAULT_AUTOCOMPLETE_LIMIT)
+
+
+class PantryQuerySerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        source='ingredient_ids',
+        allow_empty=False,
+        max_length=MAX_PANTRY_INGREDIENTS
+    )
+    limit = serializers.IntegerField(min_value=1,
+                                     max_value=MAX_PANTRY_LIMIT,
+                                     default=DEFAULT_PANTRY_LIMIT)
+
+
+class BulkActionSerializer(serializers.Serializer):
+    add = serializers.ListField(child=serializers.IntegerField(min_value=1),
+                                max_length=MAX_BULK_ITEMS,
+                                default=list)
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=MAX_BULK_ITEMS,
+        default=list
+    )
+
+    def validate(self, data):
+        add_ids = list(dict.fromkeys(data['add']))
+        remove_ids = list(dict.fromkeys(data['remove']))
+        if not add_ids and not remove_ids:
+            raise serializers.ValidationError(
+                'Передайте id для добавления или удаления!'
+            )
+        if set(add_ids) & set(remove_ids):
+            raise serializers.ValidationError(
+                'Нельзя одновременно добавить и удалить один id!'
+            )
+        return {'add_ids': add_ids, 'remove_ids': remove_ids}
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
-    ingredients = IngredientListSerializer(many=True,
-                                           read_only=True)
+    ingredients = IngredientListSerializer(
+        source='recipeingredientamount_set',
+        many=True,
+        read_only=True
+    )
     image = serializers.ImageField()
+    image_variants = ImageVariantsField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -137,48 +214,30 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'author',
                   'name',
                   'image',
+                  'image_variants',
                   'text',
                   'ingredients',
                   'tags',
                   'cooking_time',
                   'is_favorited',
                   'is_in_shopping_cart')
+        list_serializer_class = ViewerStateListSerializer
+
+    def preload_viewer_state(self, recipes):
+        ViewerState.from_context(self.context).load_recipes(recipes)
 
     def get_is_favorited(self, obj):
-        return object_exist_in_essence(self.context.get('request'),
-                                       Favorite,
-                                       obj,
-                                       'recipe',
-                                       'user')
+        return ViewerState.from_context(self.context).is_favorited(obj)
 
     def get_is_in_shopping_cart(self, obj):
-        return object_exist_in_essence(self.context.get('request'),
-                                       Cart,
-                                       obj,
-                                       'recipe',
-                                       'user')
-
-    def to_representation(self, instance):
-        context = self.context
-        context['recipe_id'] = instance.id
-
-        ingredients_serializer = IngredientListSerializer(
-            instance=instance.ingredients.all(),
-            many=True,
-            context=context
-        )
-
-        representation = super().to_representation(instance)
-        representation['ingredients'] = ingredients_serializer.data
-
-        return representation
+        return ViewerState.from_context(self.context).is_in_shopping_cart(obj)
 
 
 class RecipeCreateUpdateSeraializer(serializers.ModelSerializer):
     ingredients = IngredientPostSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(),
-                                              many=True,
-                                              required=True)
+    tags = CatalogTagField(queryset=Tag.objects.all(),
+                           many=True,
+                           required=True)
     image = Base64ImageField(use_url=True, required=True)
     author = serializers.HiddenField(
         default=serializers.CurrentUserDefault()
@@ -202,7 +261,10 @@ class RecipeCreateUpdateSeraializer(serializers.ModelSerializer):
         read_only_fields = ['is_favorited', 'is_in_shopping_cart']
 
     def to_representation(self, instance):
-        return RecipeSerializer(instance).data
+        prefetch_related_objects([instance],
+                                 'tags',
+                                 recipe_ingredients_prefetch())
+        return RecipeSerializer(instance, context=self.context).data
 
     def validate(self, data):
         tags = data.get('tags')
@@ -238,11 +300,9 @@ class RecipeCreateUpdateSeraializer(serializers.ModelSerializer):
         new_tags = validated_data.pop('tags', None)
         new_ingredients = validated_data.pop('ingredients', None)
 
-        instance.recipetag_set.all().delete()
-        tag_create(new_tags, instance)
+        tag_update(new_tags, instance)
 
-        instance.recipeingredientamount_set.all().delete()
-        ingredient_create(new_ingredients, instance)
+        ingredient_update(new_ingredients, instance)
 
         instance.save()
 
@@ -250,10 +310,19 @@ class RecipeCreateUpdateSeraializer(serializers.ModelSerializer):
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
+
+
+class PantryRecipeSerializer(RecipeShortSerializer):
+    matched = serializers.IntegerField(read_only=True)
+    total = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeShortSerializer.Meta):
+        fields = RecipeShortSerializer.Meta.fields + ('matched', 'total')
 
 
 class FollowSerializer(serializers.ModelSerializer):
@@ -270,10 +339,7 @@ class FollowSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.BooleanField(source='following.is_subscribed',
                                              read_only=True)
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(
-        source='following.recipe_set.count',
-        read_only=True
-    )
+    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Follow
@@ -302,17 +368,17 @@ class FollowSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError('Подписка уже существует!')
             return follow_obj
 
+    def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        return obj.following.recipe_set.count()
+
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes_limit = None
-        if request:
-            recipes_limit = request.query_params.get(
-                'recipes_limit'
+        recipes_by_author = self.context.get('recipes_by_author')
+        if recipes_by_author is None:
+            recipes_by_author = latest_recipes_by_author(
+                [obj.following_id],
+                get_recipes_limit(self.context['request'])
             )
-        recipes = obj.following.recipe_set.all().order_by('-created')
-        if not recipes.count() > RECIPE_SLICE:
-            return RecipeShortSerializer(recipes, many=True).data
-        if recipes_limit:
-            return RecipeShortSerializer(recipes[:int(recipes_limit)],
-                                         many=True).data
-        return RecipeShortSerializer(recipes[:RECIPE_SLICE], many=True).data
+        return RecipeShortSerializer(recipes_by_author[obj.following_id],
+                                     many=True).data
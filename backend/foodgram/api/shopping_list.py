@@ -0,0 +1,158 @@
+from io import BytesIO
+import csv
+import hashlib
+import json
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from .cart_totals import cart_rows
+from .catalog import get_version
+from .workers import get_pool
+
+
+FONT_NAME = 'DejaVuSerif'
+FONT_PATH = os.path.join(settings.BASE_DIR, 'core', 'fonts', 'DejaVuSerif.ttf')
+FONT_SIZE = 12
+X_COORDINATE = 100
+Y_COORDINATE = 700
+Y_OFFSET = 12
+BOTTOM_MARGIN = 50
+CHUNK_SIZE = 64 * 1024
+FILENAME = 'shopping_list'
+CACHE_PREFIX = 'shopping_list'
+CSV_HEADER = ('name', 'measurement_unit', 'amount')
+
+
+def register_font():
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+
+def format_line(name, measurement_unit, total):
+    return f"{name}({measurement_unit}) - {total}"
+
+
+def write_txt(rows):
+    for row in rows:
+        yield format_line(*row) + '\n'
+
+
+class Echo:
+
+    def write(self, value):
+        return value
+
+
+def write_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_json(rows):
+    yield '['
+    for index, row in enumerate(rows):
+        if index:
+            yield ','
+        yield json.dumps(dict(zip(CSV_HEADER, row)), ensure_ascii=False)
+    yield ']'
+
+
+def render_pdf(rows):
+    register_font()
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer)
+    text = None
+    for row in rows:
+        if text is None or text.getY() < BOTTOM_MARGIN:
+            if text is not None:
+                pdf.drawText(text)
+                pdf.showPage()
+            text = pdf.beginText(X_COORDINATE, Y_COORDINATE)
+            text.setFont(FONT_NAME, FONT_SIZE, leading=Y_OFFSET)
+        text.textLine(format_line(*row))
+    if text is not None:
+        pdf.drawText(text)
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def cart_digest(user):
+    state = user.cart_user.filter(recipe__isnull=False).order_by(
+        'recipe_id'
+    ).values_list('recipe_id', 'recipe__updated')
+    version, _ = get_version()
+    digest = hashlib.sha256(f'{version};'.encode())
+    for recipe_id, updated in state:
+        digest.update(f'{recipe_id}:{updated.isoformat()};'.encode())
+    return digest.hexdigest()
+
+
+def user_pointer_key(user_id):
+    return f'{CACHE_PREFIX}:user:{user_id}'
+
+
+def get_cached_export(user, export_format):
+    key = f'{CACHE_PREFIX}:{export_format}:{cart_digest(user)}'
+    content = cache.get(key)
+    if content is None:
+        content = get_pool('shopping_list').run(
+            EXPORT_FORMATS[export_format]['renderer'], cart_rows(user)
+        )
+        cache.set_many({key: content, user_pointer_key(user.id): key},
+                       settings.SHOPPING_LIST_CACHE_TIMEOUT)
+    return content
+
+
+def invalidate_shopping_lists(user_ids):
+    pointer_keys = [user_pointer_key(user_id) for user_id in set(user_ids)]
+    if not pointer_keys:
+        return
+    stale_keys = list(cache.get_many(pointer_keys).values())
+    cache.delete_many(pointer_keys + stale_keys)
+
+
+def iter_chunks(content, chunk_size=CHUNK_SIZE):
+    view = memoryview(content)
+    for start in range(0, len(view), chunk_size):
+        yield bytes(view[start:start + chunk_size])
+
+
+def encode_chunks(chunks):
+    for chunk in chunks:
+        yield chunk.encode()
+
+
+EXPORT_FORMATS = {
+    'pdf': {'content_type': 'application/pdf', 'renderer': render_pdf},
+    'txt': {'content_type': 'text/plain; charset=utf-8', 'writer': write_txt},
+    'csv': {'content_type': 'text/csv; charset=utf-8', 'writer': write_csv},
+    'json': {'content_type': 'application/json', 'writer': write_json},
+}
+
+
+def shopping_list_response(user, export_format='pdf'):
+    export = EXPORT_FORMATS[export_format]
+    if 'renderer' in export:
+        content = get_cached_export(user, export_format)
+        response = StreamingHttpResponse(iter_chunks(content),
+                                         content_type=export['content_type'])
+        response['Content-Length'] = len(content)
+    else:
+        rows = cart_rows(user)
+        response = StreamingHttpResponse(
+            encode_chunks(export['writer'](rows)),
+            content_type=export['content_type']
+        )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{FILENAME}.{export_format}"'
+    )
+    return response
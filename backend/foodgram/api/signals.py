@@ -0,0 +1,131 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Cart, Ingredient, Recipe, Tag
+from .cart_totals import (change_cart_totals, derive_cart_totals,
+                          remove_recipe_from_totals, signals_apply_totals)
+from .catalog import invalidate_catalog
+from .fragments import delete_fragment, invalidate_fragments
+from .images import schedule_variants
+from .pantry import invalidate_pantry, record_pantry_changes
+from .response_cache import bump_generation
+from .search import drop_from_search, refresh_search
+from .shopping_list import invalidate_shopping_lists
+
+User = get_user_model()
+
+AUTHOR_FIELDS = ('username', 'email', 'first_name', 'last_name')
+
+
+def cart_user_ids(recipe):
+    return Cart.objects.filter(recipe=recipe).values_list('user_id',
+                                                          flat=True)
+
+
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+def cart_changed(sender, instance, **kwargs):
+    invalidate_shopping_lists([instance.user_id])
+
+
+@receiver(pre_save, sender=Cart)
+def cart_changing(sender, instance, **kwargs):
+    instance.stored_user_id = None
+    if instance.pk is not None:
+        instance.stored_user_id = Cart.objects.filter(
+            pk=instance.pk
+        ).values_list('user_id', flat=True).first()
+
+
+@receiver(post_save, sender=Cart)
+def cart_saved(sender, instance, created, **kwargs):
+    if not signals_apply_totals():
+        return
+    if created:
+        change_cart_totals(instance.user_id, [instance.recipe_id], 1)
+    else:
+        user_ids = {instance.user_id, instance.stored_user_id}
+        derive_cart_totals(user_ids - {None})
+
+
+@receiver(post_delete, sender=Cart)
+def cart_deleted(sender, instance, **kwargs):
+    if signals_apply_totals():
+        change_cart_totals(instance.user_id, [instance.recipe_id], -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    bump_generation('recipes')
+    if not created:
+        user_ids = list(cart_user_ids(instance))
+        invalidate_shopping_lists(user_ids)
+        derive_cart_totals(user_ids)
+    image_name = instance.image.name
+    recipe_id = instance.id
+    transaction.on_commit(lambda: schedule_variants(image_name))
+    transaction.on_commit(lambda: refresh_search([recipe_id]))
+    transaction.on_commit(lambda: record_pantry_changes([recipe_id]))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    bump_generation('recipes')
+    user_ids = list(cart_user_ids(instance))
+    invalidate_shopping_lists(user_ids)
+    remove_recipe_from_totals(instance.id, user_ids)
+    delete_fragment(instance)
+    drop_from_search(instance.id)
+    recipe_id = instance.id
+    transaction.on_commit(lambda: record_pantry_changes([recipe_id]))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, **kwargs):
+    if created:
+        return
+    recipe_ids = list(Recipe.objects.filter(
+        recipeingredientamount__ingredients=instance
+    ).values_list('id', flat=True).distinct())
+    transaction.on_commit(lambda: refresh_search(recipe_ids))
+
+
+@receiver(pre_save, sender=User)
+def author_changing(sender, instance, update_fields=None, **kwargs):
+    instance.author_fields_changed = False
+    if instance.pk is None or (
+        update_fields and not set(update_fields) & set(AUTHOR_FIELDS)
+    ):
+        return
+    stored = User.objects.filter(pk=instance.pk).values(*AUTHOR_FIELDS)
+    instance.author_fields_changed = any(
+        row[field] != getattr(instance, field)
+        for row in stored for field in AUTHOR_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, **kwargs):
+    if not getattr(instance, 'author_fields_changed', False):
+        return
+    Recipe.objects.filter(author=instance).update(updated=timezone.now())
+    bump_generation('recipes')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def catalog_changed(sender, **kwargs):
+    invalidate_catalog()
+    bump_generation('recipes')
+    invalidate_fragments()
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, **kwargs):
+    invalidate_pantry()
@@ -0,0 +1,720 @@
+from io import StringIO
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from core.models import (Cart, CartTotal, Ingredient, Recipe,
+                         RecipeIngredientAmount, RecipeTag, Tag)
+from .cart_totals import derive_cart_totals
+from .catalog import get_catalog, get_version
+from .images import refresh_variants, variant_names
+from .shopping_list import EXPORT_FORMATS
+from .workers import _pools, get_pool
+
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+THROUGH_TABLES = ('core_recipetag', 'core_recipeingredientamount')
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAf'
+         'FcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+
+
+def render_rows(rows):
+    return repr(rows).encode()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+class RecipeFixturesMixin:
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='author', email='author@example.com',
+            password='pass12345', first_name='Имя', last_name='Фамилия'
+        )
+        self.tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                      slug='breakfast')
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {i}', measurement_unit='г')
+            for i in range(60)
+        )
+        self.ingredients = list(Ingredient.objects.order_by('id'))
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, count=3, **fields):
+        data = {
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 5,
+            'image': IMAGE,
+            'tags': [self.tag.id],
+            'ingredients': self.ingredients[:count],
+        }
+        data.update(fields)
+        data['ingredients'] = [{'id': ingredient.id, 'amount': 10}
+                               for ingredient in data['ingredients']]
+        response = self.client.post('/api/recipes/', data, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeQueriesTest(RecipeFixturesMixin, APITestCase):
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        for _ in range(6):
+            self.create_recipe()
+        for limit in (2, 6):
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(8):
+                    response = self.client.get('/api/recipes/',
+                                               {'limit': limit})
+                self.assertEqual(len(response.json()['results']), limit)
+                with self.assertNumQueries(5):
+                    self.client.get('/api/recipes/', {'limit': limit})
+
+    def test_retrieve_queries(self):
+        for ingredients in (1, 10):
+            with self.subTest(ingredients=ingredients):
+                recipe_id = self.create_recipe(ingredients)
+                with self.assertNumQueries(7):
+                    response = self.client.get(f'/api/recipes/{recipe_id}/')
+                self.assertEqual(len(response.json()['ingredients']),
+                                 ingredients)
+
+    def test_save_queries_do_not_depend_on_ingredients(self):
+        for ingredients in (1, 30):
+            with self.subTest(ingredients=ingredients):
+                cache.clear()
+                with self.assertNumQueries(12):
+                    recipe_id = self.create_recipe(ingredients)
+                with self.assertNumQueries(16):
+                    response = self.client.patch(
+                        f'/api/recipes/{recipe_id}/', {
+                            'tags': [self.tag.id],
+                            'ingredients': [
+                                {'id': ingredient.id, 'amount': 20}
+                                for ingredient
+                                in self.ingredients[30:30 + ingredients]
+                            ],
+                        }, format='json'
+                    )
+                self.assertEqual(response.status_code, 200,
+                                 response.content)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@mock.patch('api.signals.schedule_variants')
+class RecipeSearchTest(RecipeFixturesMixin, APITestCase):
+
+    def test_name_ranks_above_ingredients_and_text(self, schedule_variants):
+        basil = Ingredient.objects.create(name='basil', measurement_unit='г')
+        with self.captureOnCommitCallbacks(execute=True):
+            in_name = self.create_recipe(name='Basil soup')
+            in_ingredients = self.create_recipe(
+                name='Pesto', ingredients=[basil, *self.ingredients[:2]]
+            )
+            in_text = self.create_recipe(name='Pasta',
+                                         text='Serve with fresh basil')
+            self.create_recipe(name='Porridge')
+        response = self.client.get('/api/recipes/', {'search': 'basil'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([recipe['id']
+                          for recipe in response.json()['results']],
+                         [in_name, in_ingredients, in_text])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@mock.patch('api.signals.schedule_variants')
+class PantryTest(RecipeFixturesMixin, APITestCase):
+
+    def pantry(self, ingredients):
+        response = self.client.get('/api/recipes/pantry/', {
+            'ingredients': [ingredient.id for ingredient in ingredients]
+        })
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(recipe['id'], recipe['matched'], recipe['total'])
+                for recipe in response.json()]
+
+    def test_matched_and_total_counts(self, schedule_variants):
+        first, second, third = (self.create_recipe(ingredients=ingredients)
+                                for ingredients in (self.ingredients[:2],
+                                                    self.ingredients[:4],
+                                                    self.ingredients[4:7]))
+        owned = self.ingredients[:3]
+        self.assertEqual(self.pantry(owned), [(first, 2, 2), (second, 3, 4)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/recipes/{third}/', {
+                'tags': [self.tag.id],
+                'ingredients': [{'id': ingredient.id, 'amount': 10}
+                                for ingredient in (self.ingredients[0],
+                                                   self.ingredients[4])],
+            }, format='json')
+        self.assertEqual(self.pantry(owned),
+                         [(first, 2, 2), (second, 3, 4), (third, 1, 2)])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@mock.patch('api.signals.schedule_variants')
+class ImageVariantsTest(RecipeFixturesMixin, APITestCase):
+
+    def image_variants(self, recipe_id):
+        response = self.client.get(f'/api/recipes/{recipe_id}/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return data['image'], data['image_variants']
+
+    def test_generated_variants_are_recorded_on_recipe(self,
+                                                       schedule_variants):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe_id = self.create_recipe()
+        recipe = Recipe.objects.get(id=recipe_id)
+        schedule_variants.assert_called_once_with(recipe.image.name)
+        image, variants = self.image_variants(recipe_id)
+        self.assertEqual(set(variants.values()), {image})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            generated = refresh_variants(recipe.image.name)
+        names = variant_names(recipe.image.name)
+        self.assertEqual(sorted(generated), sorted(names.values()))
+        self.assertTrue(all(default_storage.exists(name)
+                            for name in names.values()))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants, names)
+        _, variants = self.image_variants(recipe_id)
+        self.assertEqual(variants, {
+            variant: f'http://testserver{default_storage.url(name)}'
+            for variant, name in names.items()
+        })
+        self.assertEqual(refresh_variants(recipe.image.name), [])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class KeysetPaginationTest(RecipeFixturesMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe_ids = [self.create_recipe(1) for _ in range(7)]
+        Recipe.objects.filter(id__in=self.recipe_ids[1:5]).update(
+            created=Recipe.objects.get(id=self.recipe_ids[1]).created
+        )
+        self.expected = list(Recipe.objects.order_by(
+            '-created', '-id'
+        ).values_list('id', flat=True))
+
+    def get_page(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        return [recipe['id'] for recipe in data['results']], data
+
+    def test_next_and_previous_cover_every_row_once(self):
+        pages = []
+        ids, data = self.get_page('/api/recipes/',
+                                  {'pagination': 'cursor', 'limit': 2})
+        self.assertIsNone(data['previous'])
+        pages.append(ids)
+        while data['next']:
+            ids, data = self.get_page(data['next'])
+            pages.append(ids)
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual([len(ids) for ids in pages], [2, 2, 2, 1])
+        for expected_ids in reversed(pages[:-1]):
+            ids, data = self.get_page(data['previous'])
+            self.assertEqual(ids, expected_ids)
+        self.assertIsNone(data['previous'])
+
+    def test_invalid_cursor_returns_404(self):
+        for cursor in ('broken', 'e30=', 'eyJjIjogIngiLCAiaSI6IDF9'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/recipes/',
+                                           {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+    def test_ordering_with_cursor_returns_400(self):
+        response = self.client.get('/api/recipes/', {
+            'pagination': 'cursor', 'ordering': 'favorites_count'
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeUpdateTest(RecipeFixturesMixin, APITestCase):
+
+    def through_writes(self, recipe_id, ingredients):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'/api/recipes/{recipe_id}/', {
+                'tags': [self.tag.id],
+                'ingredients': [
+                    {'id': ingredient.id, 'amount': amount}
+                    for ingredient, amount in ingredients
+                ],
+            }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [query['sql'] for query in queries.captured_queries
+                if query['sql'].startswith(WRITE_STATEMENTS)
+                and any(table in query['sql'] for table in THROUGH_TABLES)]
+
+    def rows(self, recipe_id):
+        return {
+            'tags': set(RecipeTag.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('id', 'tag_id')),
+            'ingredients': set(RecipeIngredientAmount.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('id', 'ingredients_id', 'amount')),
+        }
+
+    def test_same_tags_and_ingredients_write_nothing(self):
+        recipe_id = self.create_recipe(5)
+        before = self.rows(recipe_id)
+        writes = self.through_writes(
+            recipe_id, [(ingredient, 10) for ingredient
+                        in self.ingredients[:5]]
+        )
+        self.assertEqual(writes, [])
+        self.assertEqual(self.rows(recipe_id), before)
+
+    def test_one_changed_amount_updates_one_row(self):
+        recipe_id = self.create_recipe(5)
+        before = self.rows(recipe_id)
+        changed = self.ingredients[2]
+        writes = self.through_writes(recipe_id, [
+            (ingredient, 25 if ingredient == changed else 10)
+            for ingredient in self.ingredients[:5]
+        ])
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE'))
+        after = self.rows(recipe_id)
+        self.assertEqual(after['tags'], before['tags'])
+        self.assertEqual(after['ingredients'] - before['ingredients'], {
+            (row_id, ingredient_id, 25)
+            for row_id, ingredient_id, _ in before['ingredients']
+            if ingredient_id == changed.id
+        })
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@mock.patch.dict(EXPORT_FORMATS['pdf'], renderer=render_rows)
+class ShoppingListTest(RecipeFixturesMixin, APITestCase):
+
+    def download(self, export_format):
+        response = self.client.get('/api/recipes/download_shopping_cart/',
+                                   {'format': export_format})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ingredient_rename_reaches_cached_pdf(self):
+        recipe_id = self.create_recipe(1)
+        self.client.post(f'/api/recipes/{recipe_id}/shopping_cart/')
+        ingredient = self.ingredients[0]
+        self.assertIn(ingredient.name, self.download('pdf'))
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.name = 'Мука'
+            ingredient.measurement_unit = 'кг'
+            ingredient.save()
+        for export_format in ('pdf', 'txt', 'csv', 'json'):
+            with self.subTest(format=export_format):
+                content = self.download(export_format)
+                self.assertIn('Мука', content)
+                self.assertIn('кг', content)
+                self.assertNotIn('Ингредиент 0', content)
+
+    @override_settings(WORKER_POOLS={'shopping_list': {
+        'MAX_WORKERS': 1, 'MAX_PENDING': 0, 'TIMEOUT': 1
+    }})
+    @mock.patch.dict(_pools, clear=True)
+    def test_saturated_pool_returns_503(self):
+        release = threading.Event()
+        get_pool('shopping_list').submit(release.wait)
+        try:
+            response = self.client.get(
+                '/api/recipes/download_shopping_cart/', {'format': 'pdf'}
+            )
+        finally:
+            release.set()
+        self.assertEqual(response.status_code, 503)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class CartTotalsTest(RecipeFixturesMixin, APITestCase):
+
+    def totals(self):
+        return set(CartTotal.objects.values_list('user_id', 'ingredient_id',
+                                                 'amount'))
+
+    def assertTotalsDerived(self):
+        current = self.totals()
+        with transaction.atomic():
+            derive_cart_totals()
+            derived = self.totals()
+            transaction.set_rollback(True)
+        self.assertEqual(current, derived)
+
+    def test_incremental_totals_match_derived(self):
+        first, second, third = (self.create_recipe(ingredients)
+                                for ingredients in (2, 3, 4))
+        reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            password='pass12345', first_name='Имя', last_name='Фамилия'
+        )
+        Cart.objects.create(user=reader, recipe_id=second)
+        self.assertTotalsDerived()
+        for recipe_id in (first, second):
+            self.client.post(f'/api/recipes/{recipe_id}/shopping_cart/')
+            self.assertTotalsDerived()
+        self.client.delete(f'/api/recipes/{first}/shopping_cart/')
+        self.assertTotalsDerived()
+        self.client.patch(f'/api/recipes/{second}/', {
+            'tags': [self.tag.id],
+            'ingredients': [{'id': ingredient.id, 'amount': 7}
+                            for ingredient in self.ingredients[1:5]],
+        }, format='json')
+        self.assertTotalsDerived()
+        self.client.post('/api/recipes/shopping_cart/bulk/', {
+            'add': [first, third], 'remove': [second]
+        }, format='json')
+        self.assertTotalsDerived()
+        Cart.objects.filter(user=reader).get().delete()
+        Cart.objects.create(user=reader, recipe_id=third)
+        self.assertTotalsDerived()
+        self.client.delete(f'/api/recipes/{third}/')
+        self.assertTotalsDerived()
+        self.assertTrue(self.totals())
+        self.assertFalse(Recipe.objects.filter(id=third).exists())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class BulkActionsTest(RecipeFixturesMixin, APITestCase):
+
+    def statuses(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return {(result['id'], result['action']): result['status']
+                for result in response.json()}
+
+    def test_recipe_statuses_and_counters(self):
+        first, second, third = (self.create_recipe() for _ in range(3))
+        missing = third + 100
+        for path, field in (('favorite', 'favorites_count'),
+                            ('shopping_cart', 'cart_count')):
+            with self.subTest(path=path):
+                self.client.post(f'/api/recipes/{first}/{path}/')
+                self.client.post(f'/api/recipes/{third}/{path}/')
+                response = self.client.post(f'/api/recipes/{path}/bulk/', {
+                    'add': [first, second, missing],
+                    'remove': [third, missing + 1, third + 50],
+                }, format='json')
+                self.assertEqual(self.statuses(response), {
+                    (first, 'add'): 'exists',
+                    (second, 'add'): 'added',
+                    (missing, 'add'): 'not_found',
+                    (third, 'remove'): 'removed',
+                    (missing + 1, 'remove'): 'not_found',
+                    (third + 50, 'remove'): 'not_found',
+                })
+                self.assertEqual(dict(Recipe.objects.values_list(
+                    'id', field
+                )), {first: 1, second: 1, third: 0})
+                response = self.client.post(f'/api/recipes/{path}/bulk/', {
+                    'remove': [second, third]
+                }, format='json')
+                self.assertEqual(self.statuses(response), {
+                    (second, 'remove'): 'removed',
+                    (third, 'remove'): 'absent',
+                })
+                self.assertEqual(dict(Recipe.objects.values_list(
+                    'id', field
+                )), {first: 1, second: 0, third: 0})
+                response = self.client.post(f'/api/recipes/{first}/{path}/')
+                self.assertEqual(response.status_code, 400)
+
+    def test_follow_statuses(self):
+        reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            password='pass12345', first_name='Имя', last_name='Фамилия'
+        )
+        response = self.client.post('/api/users/subscriptions/bulk/', {
+            'add': [reader.id, self.user.id, reader.id + 100]
+        }, format='json')
+        self.assertEqual(self.statuses(response), {
+            (reader.id, 'add'): 'added',
+            (self.user.id, 'add'): 'forbidden',
+            (reader.id + 100, 'add'): 'not_found',
+        })
+        response = self.client.post('/api/users/subscriptions/bulk/', {
+            'add': [reader.id]
+        }, format='json')
+        self.assertEqual(self.statuses(response),
+                         {(reader.id, 'add'): 'exists'})
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, QUERY_BUDGETS_STRICT=True)
+@mock.patch('api.signals.schedule_variants')
+class QueryBudgetsTest(RecipeFixturesMixin, APITransactionTestCase):
+    """Действия укладываются в query_budgets на холодном кеше.
+
+    Без обёртки TestCase в транзакцию запросы считаются так же, как в
+    продакшене: внешние BEGIN/COMMIT не попадают в счётчик.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.recipe_ids = [self.create_recipe(10) for _ in range(3)]
+        self.reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            password='pass12345', first_name='Имя', last_name='Фамилия'
+        )
+        token = Token.objects.create(user=self.reader)
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def request(self, method, path, data=None, status=200):
+        cache.clear()
+        response = getattr(self.client, method)(path, data, format='json')
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def test_recipe_reads(self, schedule_variants):
+        recipe_id = self.recipe_ids[0]
+        self.request('get', '/api/recipes/')
+        self.request('get', '/api/recipes/', {'tags': 'breakfast'})
+        self.request('get', f'/api/recipes/{recipe_id}/')
+        self.request('get', '/api/recipes/pantry/?ingredients='
+                     f'{self.ingredients[0].id}')
+        self.client.credentials()
+        self.request('get', '/api/recipes/')
+        self.request('get', f'/api/recipes/{recipe_id}/')
+
+    def test_recipe_writes(self, schedule_variants):
+        self.client.credentials()
+        self.client.force_authenticate(self.user)
+        recipe_id = self.create_recipe(10)
+        self.request('post', f'/api/recipes/{recipe_id}/shopping_cart/',
+                     status=201)
+        ingredients = [{'id': ingredient.id, 'amount': 20}
+                       for ingredient in self.ingredients[5:15]]
+        self.request('patch', f'/api/recipes/{recipe_id}/',
+                     {'ingredients': ingredients, 'tags': [self.tag.id]})
+        self.request('put', f'/api/recipes/{recipe_id}/', {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 5,
+            'image': IMAGE, 'tags': [self.tag.id],
+            'ingredients': ingredients,
+        })
+        self.request('delete', f'/api/recipes/{recipe_id}/', status=204)
+
+    def test_recipe_actions(self, schedule_variants):
+        recipe_id = self.recipe_ids[0]
+        for path in ('favorite', 'shopping_cart'):
+            with self.subTest(path=path):
+                url = f'/api/recipes/{recipe_id}/{path}/'
+                self.request('post', url, status=201)
+                self.request('delete', url, status=204)
+                self.request('post', f'/api/recipes/{path}/bulk/', {
+                    'add': self.recipe_ids[1:], 'remove': [recipe_id]
+                })
+        self.request('get', '/api/recipes/shopping_cart/')
+        for export_format in ('pdf', 'txt', 'csv'):
+            with self.subTest(format=export_format):
+                self.request('get', '/api/recipes/download_shopping_cart/',
+                             {'format': export_format})
+
+    def test_user_actions(self, schedule_variants):
+        author_id = self.user.id
+        self.request('get', '/api/users/')
+        self.request('get', f'/api/users/{author_id}/')
+        self.request('get', '/api/users/me/')
+        self.request('post', f'/api/users/{author_id}/subscribe/',
+                     status=201)
+        self.request('get', '/api/users/subscriptions/')
+        self.request('delete', f'/api/users/{author_id}/subscribe/',
+                     status=204)
+        self.request('post', '/api/users/subscriptions/bulk/',
+                     {'add': [author_id]})
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_server_timing_header(self, schedule_variants):
+        response = self.request('get', '/api/recipes/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+
+@override_settings(INGREDIENT_AUTOCOMPLETE_BACKEND='database')
+class AutocompleteTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('sea salt', 'basalt', 'sugar', 'salt', 'pepper')
+        )
+
+    def names(self, name, limit):
+        response = self.client.get('/api/ingredients/autocomplete/',
+                                   {'name': name, 'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.json()]
+
+    def test_prefix_matches_fill_the_limit_first(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names('S', 2), ['salt', 'sea salt'])
+
+    def test_substring_matches_fill_remaining_slots(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.names('sa', 3),
+                             ['salt', 'basalt', 'sea salt'])
+
+
+class LoadIngredientsTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def load(self, path, *args):
+        stdout = StringIO()
+        call_command('load_ingredients', path, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_loading_same_file_twice_adds_nothing(self):
+        path = self.write('ingredients.csv', (
+            'мука,г\nсоль,г\nмука,г\n,г\nсахар\n'
+            f'{"я" * 201},г\nмолоко,мл\n'
+        ))
+        output = self.load(path, '--batch-size', '2')
+        self.assertIn('Прочитано: 4, добавлено: 3, пропущено: 3', output)
+        output = self.load(path)
+        self.assertIn('добавлено: 0', output)
+        self.assertEqual(sorted(Ingredient.objects.values_list(
+            'name', 'measurement_unit'
+        )), [('молоко', 'мл'), ('мука', 'г'), ('соль', 'г')])
+
+    def test_json_matches_csv(self):
+        path = self.write('ingredients.json', json.dumps([
+            {'name': 'мука', 'measurement_unit': 'г'},
+            {'name': 'мука', 'measurement_unit': 'кг'},
+        ], ensure_ascii=False))
+        self.assertIn('добавлено: 2', self.load(path))
+        self.assertIn('добавлено: 0', self.load(path))
+
+    def test_invalid_json_is_reported(self):
+        path = self.write('ingredients.json', '{"name": "мука"}')
+        with self.assertRaisesMessage(CommandError, 'ingredients.json'):
+            self.load(path)
+
+
+class ExplainFiltersTest(TestCase):
+
+    def test_seeded_plans_are_rolled_back(self):
+        stdout = StringIO()
+        call_command('explain_filters', '--seed-data', '--authors', '2',
+                     '--recipes-per-author', '2', '--max-filters', '1',
+                     stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn('== без фильтров', output)
+        for name in ('tags', 'author', 'ingredients', 'is_favorited',
+                     'is_in_shopping_cart'):
+            self.assertIn(f'== {name}\n', output)
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+
+class CatalogVersionTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_version_changes_after_commit(self):
+        catalog = get_catalog()
+        version = get_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = Tag.objects.create(name='Ужин', color='#000000',
+                                     slug='dinner')
+            self.assertEqual(get_version(), version)
+            self.assertIs(get_catalog(), catalog)
+        self.assertNotEqual(get_version(), version)
+        self.assertIn(tag.id, get_catalog().tags)
+
+
+class CatalogEndpointsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                     slug='breakfast')
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('Соль', 'сахар', 'Перец', 'Соус')
+        )
+        cls.salt = Ingredient.objects.get(name='Соль')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_list_and_retrieve(self):
+        response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{
+            'id': self.tag.id, 'name': 'Завтрак',
+            'color': '#E26C2D', 'slug': 'breakfast',
+        }])
+        response = self.client.get(f'/api/ingredients/{self.salt.id}/')
+        self.assertEqual(response.json(), {
+            'id': self.salt.id, 'name': 'Соль', 'measurement_unit': 'г',
+        })
+        self.assertEqual(self.client.get('/api/tags/0/').status_code, 404)
+        self.assertEqual(self.client.get('/api/tags/x/').status_code, 404)
+
+    def test_name_filters_by_prefix(self):
+        response = self.client.get('/api/ingredients/', {'name': 'с'})
+        self.assertEqual(
+            [ingredient['name'] for ingredient in response.json()],
+            ['сахар', 'Соль', 'Соус']
+        )
+
+    def test_unchanged_catalog_returns_304(self):
+        response = self.client.get('/api/ingredients/')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/ingredients/',
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(f'/api/tags/{self.tag.id}/',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_committed_change_gets_new_etag(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'Ужин'
+            self.tag.save()
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['name'], 'Ужин')
@@ -1,8 +1,59 @@
+from django.db import transaction
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import Greatest, RowNumber
 from rest_framework.response import Response
 from rest_framework import status, serializers
 
-from core.models import (Amount, Ingredient, RecipeIngredientAmount, Recipe,
-                         RecipeTag)
+from core.models import (Cart, Favorite, Ingredient,
+                         RecipeIngredientAmount, Recipe, RecipeTag)
+from .cart_totals import lock_users
+from .catalog import get_catalog
+
+
+RECIPE_SLICE = 3
+
+COUNTER_FIELDS = {
+    Favorite: 'favorites_count',
+    Cart: 'cart_count',
+}
+
+
+def recipe_ingredients_prefetch():
+    return Prefetch(
+        'recipeingredientamount_set',
+        queryset=RecipeIngredientAmount.objects.select_related(
+            'ingredients'
+        ).filter(ingredients__isnull=False).order_by('id')
+    )
+
+
+def get_recipes_limit(request):
+    recipes_limit = request.query_params.get('recipes_limit', '')
+    if recipes_limit.isdigit() and int(recipes_limit) > 0:
+        return int(recipes_limit)
+    return RECIPE_SLICE
+
+
+def latest_recipes_by_author(author_ids, limit):
+    if not author_ids:
+        return {}
+    ranked = Recipe.objects.filter(author_id__in=author_ids).order_by(
+    ).annotate(row_number=Window(
+        RowNumber(),
+        partition_by=[F('author_id')],
+        order_by=[F('created').desc(), F('id').desc()]
+    )).values('id', 'name', 'image', 'image_variants', 'cooking_time',
+              'author_id', 'row_number')
+    sql, params = ranked.query.sql_with_params()
+    recipes = Recipe.objects.raw(
+        f'SELECT * FROM ({sql}) ranked WHERE row_number <= %s '
+        'ORDER BY author_id, row_number',
+        (*params, limit)
+    )
+    recipes_by_author = {author_id: [] for author_id in author_ids}
+    for recipe in recipes:
+        recipes_by_author[recipe.author_id].append(recipe)
+    return recipes_by_author
 
 
 def filter_queryset(user, model, queryset):
@@ -14,70 +65,138 @@ def filter_queryset(user, model, queryset):
     return queryset.none()
 
 
-def object_exist_in_essence(request,
-                            model,
-                            serialize_obj,
-                            first_field,
-                            second_field):
-    if request and not request.user.is_anonymous:
-        return model.objects.filter(
-            **{f"{first_field}": serialize_obj,
-               f"{second_field}": request.user}
-        ).exists()
-    return False
+def resolve_ingredients(ingredient_ids):
+    catalog_ingredients = get_catalog().ingredients
+    resolved = {pk: catalog_ingredients[pk] for pk in ingredient_ids
+                if pk in catalog_ingredients}
+    missing = set(ingredient_ids) - resolved.keys()
+    if missing:
+        resolved.update(Ingredient.objects.in_bulk(missing))
+    return resolved
+
+
+def validate_ingredients(ingredients):
+    ingredients_id = [ingredient['id'] for ingredient in ingredients]
+    unique_ids = set(ingredients_id)
+    resolved = resolve_ingredients(unique_ids)
+    if len(resolved) != len(unique_ids):
+        raise serializers.ValidationError('Ингредиента не существует!')
+    if len(unique_ids) != len(ingredients_id):
+        raise serializers.ValidationError('Ингредиент дублируется!')
+    return resolved
 
 
 def ingredient_create(ingredients, recipe):
-    recipe_ingr_amount = []
-    ingredients_id = []
-    for ingredient in ingredients:
-        amount_obj, created = Amount.objects.get_or_create(
-            amount=ingredient['amount']
-        )
-        ingredient_obj = Ingredient.objects.filter(id=ingredient['id'])
-        if not ingredient_obj.exists():
-            raise serializers.ValidationError('Ингредиента не существует!')
-        if ingredient['id'] in ingredients_id:
-            raise serializers.ValidationError('Ингредиент дублируется!')
-        ingredients_id.append(ingredient['id'])
-        recipe_ingr_amount_composition = RecipeIngredientAmount(
-            recipe=recipe,
-            amount=amount_obj,
-            ingredients=ingredient_obj.first()
-        )
-        recipe_ingr_amount.append(recipe_ingr_amount_composition)
-    RecipeIngredientAmount.objects.bulk_create(recipe_ingr_amount)
+    resolved = validate_ingredients(ingredients)
+    RecipeIngredientAmount.objects.bulk_create(
+        RecipeIngredientAmount(recipe=recipe,
+                               amount=ingredient['amount'],
+                               ingredients=resolved[ingredient['id']])
+        for ingredient in ingredients
+    )
+
+
+def ingredient_update(ingredients, recipe):
+    resolved = validate_ingredients(ingredients)
+    wanted = {ingredient['id']: ingredient['amount']
+              for ingredient in ingredients}
+    existing = {}
+    stale_ids = []
+    for row in RecipeIngredientAmount.objects.filter(
+        recipe=recipe
+    ).order_by('id'):
+        if (row.ingredients_id not in wanted
+                or row.ingredients_id in existing):
+            stale_ids.append(row.id)
+        else:
+            existing[row.ingredients_id] = row
+    changed = [row for pk, row in existing.items()
+               if row.amount != wanted[pk]]
+    added = [pk for pk in wanted if pk not in existing]
+    if stale_ids:
+        RecipeIngredientAmount.objects.filter(id__in=stale_ids).delete()
+    if not changed and not added:
+        return
+    for row in changed:
+        row.amount = wanted[row.ingredients_id]
+    RecipeIngredientAmount.objects.bulk_update(changed, ['amount'])
+    RecipeIngredientAmount.objects.bulk_create(
+        RecipeIngredientAmount(recipe=recipe,
+                               amount=wanted[pk],
+                               ingredients=resolved[pk])
+        for pk in added
+    )
+
+
+def change_counter(model, recipe_ids, delta):
+    field = COUNTER_FIELDS.get(model)
+    if field is None or not recipe_ids:
+        return
+    Recipe.objects.filter(id__in=recipe_ids).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
 
 
 def recipe_actions(request, model, serializer, pk):
     user = request.user
     recipe = Recipe.objects.filter(id=pk).first()
-    model_obj = model.objects.filter(user=user, recipe=recipe).first()
     if request.method == 'POST':
         if recipe is None:
             raise serializers.ValidationError('Рецепта не сущетсвует!')
-        if model_obj is not None:
-            raise serializers.ValidationError('Объект уже добавлен')
-        model.objects.create(user=user, recipe=recipe)
+        with transaction.atomic():
+            lock_users([user.id])
+            if model.objects.filter(user=user, recipe=recipe).exists():
+                raise serializers.ValidationError('Объект уже добавлен')
+            model.objects.create(user=user, recipe=recipe)
+            change_counter(model, [recipe.id], 1)
         serializer = serializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     if request.method == 'DELETE':
         if recipe is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        if model_obj is None:
-            raise serializers.ValidationError('Объекта не существует')
-        model_obj.delete()
+        with transaction.atomic():
+            lock_users([user.id])
+            model_obj = model.objects.filter(user=user,
+                                             recipe=recipe).first()
+            if model_obj is None:
+                raise serializers.ValidationError('Объекта не существует')
+            model_obj.delete()
+            change_counter(model, [recipe.id], -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 def tag_create(tags, recipe):
     recipe_tags = []
-    tags_exist = []
+    tags_exist = set()
     for tag in tags:
-        if tag in tags_exist:
+        if tag.id in tags_exist:
             raise serializers.ValidationError('Данный тег уже добавлен')
-        tags_exist.append(tag)
+        tags_exist.add(tag.id)
         recipe_tag_composition = RecipeTag(recipe=recipe, tag=tag)
         recipe_tags.append(recipe_tag_composition)
     RecipeTag.objects.bulk_create(recipe_tags)
+
+
+def tag_update(tags, recipe):
+    wanted = set()
+    for tag in tags:
+        if tag.id in wanted:
+            raise serializers.ValidationError('Данный тег уже добавлен')
+        wanted.add(tag.id)
+    existing = set()
+    stale_ids = []
+    for row_id, tag_id in RecipeTag.objects.filter(
+        recipe=recipe
+    ).values_list('id', 'tag_id').order_by('id'):
+        if tag_id not in wanted or tag_id in existing:
+            stale_ids.append(row_id)
+        else:
+            existing.add(tag_id)
+    if stale_ids:
+        RecipeTag.objects.filter(id__in=stale_ids).delete()
+    added = [tag for tag in tags if tag.id not in existing]
+    if added:
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag=tag) for tag in added
+        )
@@ -0,0 +1,65 @@
+from core.models import Cart, Favorite, Follow
+
+
+class ViewerState:
+    """Избранное, корзина и подписки пользователя в рамках запроса."""
+
+    def __init__(self, user=None):
+        self.user = user
+        self.recipe_ids = set()
+        self.author_ids = set()
+        self.favorites = set()
+        self.cart = set()
+        self.following = set()
+
+    @classmethod
+    def from_context(cls, context):
+        state = context.get('viewer_state')
+        if state is None:
+            request = context.get('request')
+            state = cls(request.user if request else None)
+            context['viewer_state'] = state
+        return state
+
+    @property
+    def is_anonymous(self):
+        return self.user is None or self.user.is_anonymous
+
+    def load_recipes(self, recipes):
+        recipes = [recipe for recipe in recipes
+                   if recipe.id not in self.recipe_ids]
+        if not recipes:
+            return self
+        recipe_ids = [recipe.id for recipe in recipes]
+        self.recipe_ids.update(recipe_ids)
+        if not self.is_anonymous:
+            self.favorites.update(Favorite.objects.filter(
+                user=self.user, recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True))
+            self.cart.update(Cart.objects.filter(
+                user=self.user, recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True))
+        return self.load_authors(recipe.author_id for recipe in recipes)
+
+    def load_authors(self, author_ids):
+        author_ids = set(author_ids) - self.author_ids
+        if not author_ids:
+            return self
+        self.author_ids.update(author_ids)
+        if not self.is_anonymous:
+            self.following.update(Follow.objects.filter(
+                user=self.user, following_id__in=author_ids
+            ).values_list('following_id', flat=True))
+        return self
+
+    def is_favorited(self, recipe):
+        return recipe.id in self.load_recipes([recipe]).favorites
+
+    def is_in_shopping_cart(self, recipe):
+        return recipe.id in self.load_recipes([recipe]).cart
+
+    def is_following(self, author_id):
+        return author_id in self.load_authors([author_id]).following
+
+    def is_subscribed(self, user):
+        return self.is_following(user.id)
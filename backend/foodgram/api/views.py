@@ -1,21 +1,13 @@
-from io import BytesIO
-import os
-
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
 from django_filters import rest_framework as filter
-from django.http import HttpResponse
-from django.conf import settings
 from djoser.views import UserViewSet
 from rest_framework import viewsets, status, permissions, serializers
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.decorators import action
+from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
-from rest_framework.exceptions import AuthenticationFailed
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from django.db.models import Sum
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from django.db.models import Count
 
 from .serializers import (CustomUserSerializer,
                           RecipeSerializer,
@@ -25,33 +17,50 @@ from .serializers import (CustomUserSerializer,
                           RecipeShortSerializer,
                           CustomPostUserSerializer,
                           ChangePasswordSerializer,
-                          IngredientSerializer)
-from .custom_filters import RecipeFilter, IngredientFilter
+                          IngredientSerializer,
+                          AutocompleteQuerySerializer,
+                          PantryQuerySerializer,
+                          PantryRecipeSerializer,
+                          CartTotalSerializer,
+                          BulkActionSerializer)
+from .autocomplete import autocomplete
+from .bulk_actions import bulk_follow, bulk_recipe_actions
+from .catalog import conditional_response, get_catalog, set_validators
+from .custom_filters import RecipeFilter
+from .custom_paginator import select_pagination
+from .fragments import RecipeFragmentMixin
+from .pantry import pantry_recipes
 from core.models import (Recipe,
                          Tag,
                          Ingredient,
                          Favorite,
-                         Cart,
-                         RecipeIngredientAmount)
+                         Cart)
 from .permissions import (RecipeAuthorOrReadOnly,
                           ReadOnly,
                           IsOwnerOrAdminOrReadOnly)
-from .utils import recipe_actions
+from .renderers import SHOPPING_LIST_RENDERERS
+from .response_cache import AnonymousResponseCacheMixin
+from .shopping_list import shopping_list_response
+from .utils import (recipe_actions, recipe_ingredients_prefetch,
+                    get_recipes_limit, latest_recipes_by_author)
 
 
 User = get_user_model()
 
-X_COORDINATE = 100
-Y_COORDINATE = 700
-Y_OFFSET = 12
-FONT_SIZE = 12
-
 
 class CustomUserViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = (IsOwnerOrAdminOrReadOnly,)
     filter_backends = [filter.DjangoFilterBackend]
+    query_budgets = {
+        'list': 4,
+        'retrieve': 3,
+        'me': 2,
+        'following': 7,
+        'follow_list': 4,
+        'bulk_subscribe': 7,
+    }
 
     def get_permissions(self):
         if self.action == 'list' or self.action == 'retrieve':
@@ -119,25 +128,70 @@ class CustomUserViewSet(UserViewSet):
             raise serializers.ValidationError(
                 'Авторизуйтесь для выполнения действия!'
             )
-        follow = self.request.user.user.all()
-        paginator = PageNumberPagination()
-        paginator.page_size_query_param = 'limit'
+        follow = self.request.user.user.select_related(
+            'following'
+        ).annotate(
+            recipes_count=Count('following__recipe')
+        ).order_by('-created', '-id')
+        paginator = select_pagination(request)
         result = paginator.paginate_queryset(follow, request)
+        recipes_by_author = latest_recipes_by_author(
+            [follow_obj.following_id for follow_obj in result],
+            get_recipes_limit(request)
+        )
         serializer = FollowSerializer(
-            result, many=True, context={'request': self.request}
+            result, many=True, context={'request': self.request,
+                                        'recipes_by_author': recipes_by_author}
         )
         return paginator.get_paginated_response(serializer.data)
 
+    @action(detail=False,
+            url_path=r'subscriptions/bulk',
+            methods=['post'])
+    def bulk_subscribe(self, request):
+        if request.user.is_anonymous:
+            raise AuthenticationFailed(
+                'Авторизуйтесь для совершения действия!'
+            )
+        serializer = BulkActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(bulk_follow(request.user,
+                                    **serializer.validated_data))
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.prefetch_related(
-        'tags', 'ingredients'
+class RecipeViewSet(AnonymousResponseCacheMixin, RecipeFragmentMixin,
+                    viewsets.ModelViewSet):
+    queryset = Recipe.objects.select_related('author').prefetch_related(
+        'tags', recipe_ingredients_prefetch()
     ).all()
     serializer_class = RecipeSerializer
-    filter_backends = [filter.DjangoFilterBackend]
+    filter_backends = [filter.DjangoFilterBackend, OrderingFilter]
     filterset_class = RecipeFilter
+    ordering_fields = ('created', 'favorites_count', 'cart_count')
+    response_cache_namespace = 'recipes'
+    query_budgets = {
+        'list': 11,
+        'retrieve': 8,
+        'create': 14,
+        'update': 24,
+        'partial_update': 24,
+        'destroy': 17,
+        'favorite': 7,
+        'shopping_cart': 11,
+        'bulk_favorite': 9,
+        'bulk_shopping_cart': 15,
+        'download_shopping_cart': 4,
+        'shopping_cart_totals': 2,
+        'pantry': 3,
+    }
     permission_classes = (RecipeAuthorOrReadOnly,)
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            self._paginator = select_pagination(self.request)
+        return self._paginator
+
     def get_serializer_class(self):
         if self.action == 'list' or self.action == 'retrieve':
             return RecipeSerializer
@@ -159,55 +213,123 @@ class RecipeViewSet(viewsets.ModelViewSet):
             request, Cart, RecipeShortSerializer, pk
         )
 
+    @action(detail=False,
+            url_path=r'favorite/bulk',
+            methods=['post'])
+    def bulk_favorite(self, request):
+        return self.bulk_response(request, Favorite)
+
+    @action(detail=False,
+            url_path=r'shopping_cart/bulk',
+            methods=['post'])
+    def bulk_shopping_cart(self, request):
+        return self.bulk_response(request, Cart)
+
+    def bulk_response(self, request, model):
+        serializer = BulkActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(bulk_recipe_actions(request.user, model,
+                                            **serializer.validated_data))
+
     @action(detail=False,
             url_path=r'download_shopping_cart',
-            methods=['get'])
+            methods=['get'],
+            renderer_classes=SHOPPING_LIST_RENDERERS)
     def download_shopping_cart(self, request):
-        current_user = request.user
-        cart = current_user.cart_user.values('recipe_id')
-        ingredients = RecipeIngredientAmount.objects.prefetch_related(
-            'ingredients', 'amount'
-        ).filter(recipe_id__in=cart).values(
-            'ingredients__name', 'ingredients__measurement_unit'
-        ).annotate(ingr_sum=Sum('amount__amount')).order_by(
-            'ingredients__name'
-        )
+        if request.user.is_anonymous:
+            raise AuthenticationFailed(
+                'Авторизуйтесь для совершения действия!'
+            )
+        return shopping_list_response(request.user,
+                                      request.accepted_renderer.format)
 
-        pdf_buffer = BytesIO()
-        p = canvas.Canvas(pdf_buffer)
-        font_path = os.path.join(settings.BASE_DIR,
-                                 'core',
-                                 'fonts',
-                                 'DejaVuSerif.ttf')
-        pdfmetrics.registerFont(TTFont('DejaVuSerif', font_path))
-        x, y = X_COORDINATE, Y_COORDINATE
-        for ingredient in ingredients:
-            p.setFont('DejaVuSerif', FONT_SIZE)
-            p.drawString(x,
-                         y,
-                         f"{ingredient.get('ingredients__name')}"
-                         f"({ingredient.get('ingredients__measurement_unit')})"
-                         f" - {ingredient.get('ingr_sum')}")
-            y -= Y_OFFSET
-        p.showPage()
-        p.save()
-        pdf_buffer.seek(0)
-        response = HttpResponse(pdf_buffer.read(),
-                                content_type='application/pdf')
-        return response
-
-
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(detail=False,
+            url_path=r'shopping_cart',
+            methods=['get'])
+    def shopping_cart_totals(self, request):
+        if request.user.is_anonymous:
+            raise AuthenticationFailed(
+                'Авторизуйтесь для совершения действия!'
+            )
+        totals = request.user.cart_totals.select_related(
+            'ingredient'
+        ).order_by('ingredient__name')
+        return Response(CartTotalSerializer(totals, many=True).data)
+
+    @action(detail=False,
+            url_path=r'pantry',
+            methods=['get'])
+    def pantry(self, request):
+        serializer = PantryQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        recipes = pantry_recipes(**serializer.validated_data)
+        return Response(PantryRecipeSerializer(
+            recipes, many=True, context=self.get_serializer_context()
+        ).data)
+
+
+class CatalogViewSetMixin:
+    catalog_section = None
+
+    def get_catalog_data(self, catalog):
+        objects = getattr(catalog, self.catalog_section)
+        return catalog.memo(self.catalog_section, lambda: {
+            pk: dict(self.serializer_class(obj).data)
+            for pk, obj in objects.items()
+        })
+
+    def get_catalog_ids(self, catalog):
+        return sorted(getattr(catalog, self.catalog_section))
+
+    def list(self, request, *args, **kwargs):
+        catalog = get_catalog()
+        response = conditional_response(request, catalog)
+        if response is None:
+            data = self.get_catalog_data(catalog)
+            response = Response(
+                [data[pk] for pk in self.get_catalog_ids(catalog)]
+            )
+        return set_validators(response, catalog)
+
+    def retrieve(self, request, *args, **kwargs):
+        catalog = get_catalog()
+        data = self.get_catalog_data(catalog)
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if not pk.isdigit() or int(pk) not in data:
+            raise NotFound()
+        response = conditional_response(request, catalog)
+        if response is None:
+            response = Response(data[int(pk)])
+        return set_validators(response, catalog)
+
+
+class TagViewSet(CatalogViewSetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (permissions.AllowAny,)
     pagination_class = None
+    catalog_section = 'tags'
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogViewSetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (permissions.AllowAny,)
     pagination_class = None
-    filter_backends = (filter.DjangoFilterBackend,)
-    filterset_class = IngredientFilter
+    catalog_section = 'ingredients'
+
+    def get_catalog_ids(self, catalog):
+        name = self.request.query_params.get('name')
+        if name:
+            return [ingredient.id
+                    for ingredient in catalog.ingredient_index.prefix(name)]
+        return super().get_catalog_ids(catalog)
+
+    @action(detail=False,
+            url_path=r'autocomplete',
+            methods=['get'])
+    def autocomplete(self, request):
+        serializer = AutocompleteQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        ingredients = autocomplete(**serializer.validated_data)
+        return Response(IngredientSerializer(ingredients, many=True).data)
@@ -0,0 +1,72 @@
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                TimeoutError as FutureTimeoutError)
+import threading
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+EXECUTOR_CLASSES = {
+    'thread': ThreadPoolExecutor,
+    'process': ProcessPoolExecutor,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class WorkerPoolBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервис перегружен, попробуйте позже.'
+    default_code = 'worker_pool_busy'
+
+
+class WorkerPool:
+    """Пул с ограниченным числом задач в работе и в очереди."""
+
+    def __init__(self, kind='thread', max_workers=2, max_pending=8,
+                 timeout=30):
+        self.executor = EXECUTOR_CLASSES[kind](max_workers=max_workers)
+        self.slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self.timeout = timeout
+
+    def submit(self, fn, *args, **kwargs):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise WorkerPoolBusy()
+        return self._submit(fn, *args, **kwargs)
+
+    def try_submit(self, fn, *args, **kwargs):
+        if not self.slots.acquire(blocking=False):
+            return None
+        return self._submit(fn, *args, **kwargs)
+
+    def _submit(self, fn, *args, **kwargs):
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise WorkerPoolBusy()
+
+
+def get_pool(name):
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            config = settings.WORKER_POOLS[name]
+            pool = WorkerPool(kind=config.get('KIND', 'thread'),
+                              max_workers=config.get('MAX_WORKERS', 2),
+                              max_pending=config.get('MAX_PENDING', 8),
+                              timeout=config.get('TIMEOUT', 30))
+            _pools[name] = pool
+        return pool
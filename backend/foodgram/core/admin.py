@@ -18,16 +18,19 @@ class IngredientInline(admin.StackedInline):
 
 class RecipeAdmin(admin.ModelAdmin):
     exclude = ('is_favorited', 'is_in_shopping_cart')
-    readonly_fields = ['favorite_count']
+    readonly_fields = ['favorites_count', 'cart_count']
     list_display = (
         'name',
         'author',
+        'favorites_count',
     )
+    list_select_related = ('author',)
     list_filter = ('author', 'name', 'tags')
     inlines = (TagInline, IngredientInline)
 
-    def favorite_count(self, obj):
-        return obj.favorite_recipe.count()
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        form.instance.save(update_fields=['updated'])
 
 
 class IngredientAdmin(admin.ModelAdmin):
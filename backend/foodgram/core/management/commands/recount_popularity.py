@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from core.models import Cart, Favorite, Recipe
+
+
+COUNTERS = {
+    'favorites_count': Favorite,
+    'cart_count': Cart,
+}
+
+
+def count_rows(model):
+    return Coalesce(Subquery(
+        model.objects.filter(recipe=OuterRef('pk')).order_by().values(
+            'recipe'
+        ).annotate(total=Count('id')).values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики избранного и корзин у рецептов '
+            'и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать расхождения.')
+
+    def handle(self, *args, **options):
+        actual = {f'actual_{field}': count_rows(model)
+                  for field, model in COUNTERS.items()}
+        drift = Q()
+        for field in COUNTERS:
+            drift |= ~Q(**{field: F(f'actual_{field}')})
+        drifted = Recipe.objects.annotate(**actual).filter(drift)
+        total = drifted.count()
+        self.stdout.write(f'Рецептов с расхождениями: {total}')
+        if total and not options['dry_run']:
+            Recipe.objects.filter(
+                id__in=drifted.values('id')
+            ).update(**{field: count_rows(model)
+                        for field, model in COUNTERS.items()})
+            self.stdout.write(self.style.SUCCESS('Счётчики обновлены.'))
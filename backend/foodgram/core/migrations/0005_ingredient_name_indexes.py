@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+CREATE_INDEXES = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS core_ingredient_name_prefix_idx '
+    'ON core_ingredient (UPPER(name::text) text_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS core_ingredient_name_trgm_idx '
+    'ON core_ingredient USING gin (UPPER(name::text) gin_trgm_ops)',
+)
+
+DROP_INDEXES = (
+    'DROP INDEX IF EXISTS core_ingredient_name_trgm_idx',
+    'DROP INDEX IF EXISTS core_ingredient_name_prefix_idx',
+)
+
+
+def run_on_postgresql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_recipe_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgresql(CREATE_INDEXES),
+                             run_on_postgresql(DROP_INDEXES)),
+    ]
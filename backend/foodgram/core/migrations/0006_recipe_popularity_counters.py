@@ -0,0 +1,42 @@
+# Generated by Django 3.2 on 2026-10-18 04:11
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_rows(model):
+    return Coalesce(Subquery(
+        model.objects.filter(recipe=OuterRef('pk')).order_by().values(
+            'recipe'
+        ).annotate(total=Count('id')).values('total')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    Recipe.objects.update(
+        favorites_count=count_rows(apps.get_model('core', 'Favorite')),
+        cart_count=count_rows(apps.get_model('core', 'Cart')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_ingredient_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cart_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В корзинах'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В избранном'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2 on 2026-10-18 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_popularity_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['user', '-created', '-id'], name='follow_user_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-created', '-id'], name='recipe_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2 on 2026-10-18 04:15
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_tags(apps, schema_editor):
+    RecipeTag = apps.get_model('core', 'RecipeTag')
+    keep_ids = RecipeTag.objects.values('recipe', 'tag').annotate(
+        keep_id=Min('id')
+    ).values('keep_id')
+    RecipeTag.objects.exclude(id__in=keep_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_tags,
+                             migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='recipetag',
+            unique_together={('recipe', 'tag')},
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-created', '-id'], name='recipe_author_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipetag',
+            index=models.Index(fields=['tag', 'recipe'], name='recipetag_tag_recipe_idx'),
+        ),
+    ]
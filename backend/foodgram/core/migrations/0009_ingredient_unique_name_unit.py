@@ -0,0 +1,46 @@
+# Generated by Django 3.2 on 2026-10-18 04:18
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('core', 'Ingredient')
+    RecipeIngredientAmount = apps.get_model('core', 'RecipeIngredientAmount')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for group in duplicates:
+        stale_ids = list(Ingredient.objects.filter(
+            name=group['name'],
+            measurement_unit=group['measurement_unit']
+        ).exclude(id=group['keep_id']).values_list('id', flat=True))
+        for row in RecipeIngredientAmount.objects.filter(
+            ingredients_id__in=stale_ids
+        ):
+            if RecipeIngredientAmount.objects.filter(
+                ingredients_id=group['keep_id'],
+                recipe_id=row.recipe_id,
+                amount_id=row.amount_id
+            ).exists():
+                row.delete()
+            else:
+                row.ingredients_id = group['keep_id']
+                row.save(update_fields=['ingredients'])
+        Ingredient.objects.filter(id__in=stale_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients,
+                             migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='ingredient',
+            unique_together={('name', 'measurement_unit')},
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 3.2 on 2026-10-18 04:34
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+POSTGRESQL_FORWARD = (
+    'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+    'ON core_recipe USING gin (search_vector)',
+    "UPDATE core_recipe r SET search_vector = "
+    "setweight(to_tsvector('russian', coalesce(r.name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(("
+    "SELECT string_agg(i.name, ' ') FROM core_recipeingredientamount a "
+    "JOIN core_ingredient i ON i.id = a.ingredients_id "
+    "WHERE a.recipe_id = r.id), '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(r.text, '')), 'C')",
+)
+
+POSTGRESQL_BACKWARD = (
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+)
+
+SQLITE_FORWARD = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS recipe_search USING fts5('
+    "name, text, ingredients, tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO recipe_search (recipe_search, rank) "
+    "VALUES ('rank', 'bm25(10.0, 1.0, 5.0)')",
+    'INSERT INTO recipe_search (rowid, name, text, ingredients) '
+    'SELECT r.id, r.name, r.text, COALESCE(('
+    "SELECT group_concat(i.name, ' ') FROM core_recipeingredientamount a "
+    'JOIN core_ingredient i ON i.id = a.ingredients_id '
+    "WHERE a.recipe_id = r.id), '') FROM core_recipe r",
+)
+
+SQLITE_BACKWARD = (
+    'DROP TABLE IF EXISTS recipe_search',
+)
+
+
+def run_for_vendor(statements):
+    def operation(apps, schema_editor):
+        vendor_statements = statements.get(schema_editor.connection.vendor,
+                                           ())
+        for statement in vendor_statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_ingredient_unique_name_unit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(
+            run_for_vendor({'postgresql': POSTGRESQL_FORWARD,
+                            'sqlite': SQLITE_FORWARD}),
+            run_for_vendor({'postgresql': POSTGRESQL_BACKWARD,
+                            'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
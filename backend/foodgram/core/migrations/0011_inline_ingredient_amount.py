@@ -0,0 +1,88 @@
+# Generated by Django 3.2 on 2026-10-18 05:12
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery, Sum
+
+
+MAX_AMOUNT = 32000
+
+
+def inline_amounts(apps, schema_editor):
+    Amount = apps.get_model('core', 'Amount')
+    RecipeIngredientAmount = apps.get_model('core', 'RecipeIngredientAmount')
+    RecipeIngredientAmount.objects.filter(amount_ref__isnull=False).update(
+        amount=Subquery(Amount.objects.filter(
+            id=OuterRef('amount_ref_id')
+        ).values('amount')[:1])
+    )
+    duplicates = RecipeIngredientAmount.objects.filter(
+        recipe__isnull=False, ingredients__isnull=False
+    ).values('recipe_id', 'ingredients_id').annotate(
+        keep_id=Min('id'), total=Sum('amount'), rows=Count('id')
+    ).filter(rows__gt=1)
+    for group in duplicates:
+        RecipeIngredientAmount.objects.filter(id=group['keep_id']).update(
+            amount=min(group['total'], MAX_AMOUNT)
+        )
+        RecipeIngredientAmount.objects.filter(
+            recipe_id=group['recipe_id'],
+            ingredients_id=group['ingredients_id']
+        ).exclude(id=group['keep_id']).delete()
+
+
+def restore_amounts(apps, schema_editor):
+    Amount = apps.get_model('core', 'Amount')
+    RecipeIngredientAmount = apps.get_model('core', 'RecipeIngredientAmount')
+    values = RecipeIngredientAmount.objects.order_by().values_list(
+        'amount', flat=True
+    ).distinct()
+    for value in list(values):
+        RecipeIngredientAmount.objects.filter(amount=value).update(
+            amount_ref=Amount.objects.create(amount=value)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_search'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='ingredient',
+            name='amount',
+        ),
+        migrations.RemoveField(
+            model_name='amount',
+            name='recipe',
+        ),
+        migrations.AlterUniqueTogether(
+            name='recipeingredientamount',
+            unique_together=set(),
+        ),
+        migrations.RenameField(
+            model_name='recipeingredientamount',
+            old_name='amount',
+            new_name='amount_ref',
+        ),
+        migrations.AddField(
+            model_name='recipeingredientamount',
+            name='amount',
+            field=models.PositiveSmallIntegerField(default=0, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(32000)], verbose_name='Количество'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(inline_amounts, restore_amounts),
+        migrations.RemoveField(
+            model_name='recipeingredientamount',
+            name='amount_ref',
+        ),
+        migrations.AlterUniqueTogether(
+            name='recipeingredientamount',
+            unique_together={('recipe', 'ingredients')},
+        ),
+        migrations.DeleteModel(
+            name='Amount',
+        ),
+    ]
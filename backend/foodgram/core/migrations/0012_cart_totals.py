@@ -0,0 +1,47 @@
+# Generated by Django 3.2 on 2026-10-18 04:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+
+def derive_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('core', 'Cart')
+    CartTotal = apps.get_model('core', 'CartTotal')
+    totals = Cart.objects.filter(
+        recipe__isnull=False,
+        recipe__recipeingredientamount__ingredients__isnull=False
+    ).order_by().values_list(
+        'user_id', 'recipe__recipeingredientamount__ingredients_id'
+    ).annotate(total=Sum('recipe__recipeingredientamount__amount'))
+    CartTotal.objects.bulk_create(
+        (CartTotal(user_id=user_id, ingredient_id=ingredient_id,
+                   amount=total)
+         for user_id, ingredient_id, total in totals.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0011_inline_ingredient_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_totals', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'unique_together': {('user', 'ingredient')},
+            },
+        ),
+        migrations.RunPython(derive_cart_totals, migrations.RunPython.noop),
+    ]
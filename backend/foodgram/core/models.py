@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 
 
@@ -12,27 +13,12 @@ max_value = 32000
 class Ingredient(models.Model):
     name = models.CharField('Название', max_length=200)
     measurement_unit = models.CharField('Единица измерения', max_length=200)
-    amount = models.ManyToManyField('Amount',
-                                    through='RecipeIngredientAmount',
-                                    verbose_name='Количество')
 
-    def __str__(self):
-        return f"{self.name}({self.measurement_unit})"
-
-
-class Amount(models.Model):
-    amount = models.PositiveSmallIntegerField(verbose_name='Количество',
-                                              validators=[
-                                                  MinValueValidator(min_value),
-                                                  MaxValueValidator(max_value)
-                                              ])
-    recipe = models.ManyToManyField('Recipe',
-                                    through='RecipeIngredientAmount',
-                                    verbose_name='Рецепт')
+    class Meta:
+        unique_together = (('name', 'measurement_unit'),)
 
     def __str__(self):
-        amount = str(self.amount)
-        return amount
+        return f"{self.name}({self.measurement_unit})"
 
 
 class RecipeIngredientAmount(models.Model):
@@ -40,10 +26,11 @@ class RecipeIngredientAmount(models.Model):
                                on_delete=models.SET_NULL,
                                null=True,
                                verbose_name='Рецепт')
-    amount = models.ForeignKey(Amount,
-                               on_delete=models.SET_NULL,
-                               null=True,
-                               verbose_name='Количество')
+    amount = models.PositiveSmallIntegerField(verbose_name='Количество',
+                                              validators=[
+                                                  MinValueValidator(min_value),
+                                                  MaxValueValidator(max_value)
+                                              ])
     ingredients = models.ForeignKey(Ingredient,
                                     on_delete=models.SET_NULL,
                                     null=True,
@@ -51,7 +38,7 @@ class RecipeIngredientAmount(models.Model):
                                     related_name='ingredients')
 
     class Meta:
-        unique_together = (("ingredients", "recipe", "amount"),)
+        unique_together = (("recipe", "ingredients"),)
 
 
 class Recipe(models.Model):
@@ -60,6 +47,8 @@ class Recipe(models.Model):
                                verbose_name='Автор')
     name = models.CharField('Название', max_length=50)
     image = models.ImageField('Изображение', upload_to='recipes/images/')
+    image_variants = models.JSONField('Варианты изображения', default=dict,
+                                      blank=True, editable=False)
     text = models.TextField('Описание')
     ingredients = models.ManyToManyField(Ingredient,
                                          through='RecipeIngredientAmount',
@@ -74,9 +63,20 @@ class Recipe(models.Model):
     is_favorited = models.BooleanField('Избранное', default=False)
     is_in_shopping_cart = models.BooleanField('Корзина', default=False)
     created = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
+    favorites_count = models.PositiveIntegerField('В избранном', default=0)
+    cart_count = models.PositiveIntegerField('В корзинах', default=0)
+    search_vector = SearchVectorField('Поисковый вектор', null=True,
+                                      editable=False)
 
     class Meta:
         ordering = ('-created',)
+        indexes = (
+            models.Index(fields=('-created', '-id'),
+                         name='recipe_created_id_idx'),
+            models.Index(fields=('author', '-created', '-id'),
+                         name='recipe_author_created_id_idx'),
+        )
 
     def __str__(self):
         return self.name
@@ -101,6 +101,13 @@ class RecipeTag(models.Model):
                                null=True,
                                verbose_name='Рецепт')
 
+    class Meta:
+        unique_together = (('recipe', 'tag'),)
+        indexes = (
+            models.Index(fields=('tag', 'recipe'),
+                         name='recipetag_tag_recipe_idx'),
+        )
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User,
@@ -116,6 +123,10 @@ class Follow(models.Model):
     class Meta:
         unique_together = (('user', 'following'),)
         ordering = ('-created',)
+        indexes = (
+            models.Index(fields=('user', '-created', '-id'),
+                         name='follow_user_created_id_idx'),
+        )
 
 
 class Favorite(models.Model):
@@ -150,3 +161,17 @@ class Cart(models.Model):
     class Meta:
         unique_together = (('user', 'recipe'),)
         ordering = ('-created',)
+
+
+class CartTotal(models.Model):
+    user = models.ForeignKey(User,
+                             related_name='cart_totals',
+                             on_delete=models.CASCADE,
+                             verbose_name='Пользователь')
+    ingredient = models.ForeignKey(Ingredient,
+                                   on_delete=models.CASCADE,
+                                   verbose_name='Ингредиент')
+    amount = models.PositiveIntegerField('Количество', default=0)
+
+    class Meta:
+        unique_together = (('user', 'ingredient'),)
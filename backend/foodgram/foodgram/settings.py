@@ -30,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,6 +86,27 @@ DATABASES = {
 }
 
 
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 60))
+
+RECIPE_FRAGMENT_TIMEOUT = int(
+    os.getenv('RECIPE_FRAGMENT_TIMEOUT', 60 * 60 * 24)
+)
+
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -120,3 +142,61 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'authenticate.CustomUser'
+
+INGREDIENT_AUTOCOMPLETE_BACKEND = os.getenv(
+    'INGREDIENT_AUTOCOMPLETE_BACKEND', ''
+)
+
+SHOPPING_LIST_CACHE_TIMEOUT = int(
+    os.getenv('SHOPPING_LIST_CACHE_TIMEOUT', 60 * 60 * 24)
+)
+
+# Поток запроса ждёт результат пула в любом случае: при синхронных
+# воркерах gunicorn рендер PDF занимает воркер до конца. Пул ограничивает
+# число одновременных рендеров и отвечает 503 при перегрузке; 'process'
+# снимает с рендера GIL, но не освобождает воркер.
+WORKER_POOLS = {
+    'shopping_list': {
+        'KIND': os.getenv('SHOPPING_LIST_POOL_KIND', 'thread'),
+        'MAX_WORKERS': int(os.getenv('SHOPPING_LIST_POOL_WORKERS', 2)),
+        'MAX_PENDING': int(os.getenv('SHOPPING_LIST_POOL_PENDING', 8)),
+        'TIMEOUT': int(os.getenv('SHOPPING_LIST_POOL_TIMEOUT', 30)),
+    },
+    'images': {
+        'KIND': 'thread',
+        'MAX_WORKERS': int(os.getenv('IMAGE_POOL_WORKERS', 2)),
+        'MAX_PENDING': int(os.getenv('IMAGE_POOL_PENDING', 32)),
+        'TIMEOUT': int(os.getenv('IMAGE_POOL_TIMEOUT', 60)),
+    },
+}
+
+MAX_IMAGE_UPLOAD_SIZE = int(
+    os.getenv('MAX_IMAGE_UPLOAD_SIZE', 5 * 1024 * 1024)
+)
+
+DATA_UPLOAD_MAX_MEMORY_SIZE = MAX_IMAGE_UPLOAD_SIZE * 4 // 3 + 64 * 1024
+
+SERVER_TIMING_HEADER = (
+    os.getenv('SERVER_TIMING_HEADER', 'False').lower() == 'true'
+)
+
+QUERY_BUDGETS_STRICT = (
+    os.getenv('QUERY_BUDGETS_STRICT', 'False').lower() == 'true'
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.queries': {
+            'handlers': ['console'],
+            'level': os.getenv('QUERY_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}